@@ -1,115 +1,484 @@
 # app.py — Week5 Day24.1 hot-fix: pass preproc path to geometry (enables manual scale even w/o bbox)
-import os, sys, json, uuid, shutil, subprocess
+import os, re, sys, stat, time, random, shutil, hashlib, asyncio, string
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, File, Form, UploadFile, Request
-from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.templating import Jinja2Templates
 
 APP_ROOT = Path(__file__).parent.resolve()
+sys.path.insert(0, str(APP_ROOT / "src"))
+import jsonio
+import main as estimator_main  # only for its arg parser; the work runs in worker.py
+import worker
+import result_cache
+
 DATA_DIR = APP_ROOT / "data" / "output"
 RUNS_DIR = APP_ROOT / "runs"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-RUNS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Results of identical runs are reused (see result_cache.py); RESULT_CACHE_MB=0 disables
+CACHE_DIR = RUNS_DIR / "_cache"
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MB", "512") or 0) * 1024 * 1024
+# Vision metrics keyed by plan bytes + manual scale only: re-estimating the same plan with
+# other heights/prices/mode skips preprocess/OCR/geometry (same RESULT_CACHE_MB switch)
+VISION_CACHE_DIR = RUNS_DIR / "_vision_cache"
+# Files outside the form that also shape the outputs, so they are part of the cache key
+CACHE_INPUTS = (APP_ROOT / "data" / "prices.json",
+                APP_ROOT / "data" / "inputs" / "doors_windows_input.json",
+                APP_ROOT / "data" / "inputs" / "flooring_input.json")
+
+ARTIFACT_NAMES = ("final_estimate.xlsx", "final_estimate.pdf", "final_estimate_detailed.pdf",
+                  "final_breakdown.json", "compare_preview.png")
+UPLOAD_CHUNK = 1 << 20  # 1 MiB copy buffer for plan uploads
+PRICES_JSON_MAX = 64 * 1024  # prices.json itself is < 2 KB
 
 TEMPLATES = Jinja2Templates(directory=str(APP_ROOT / "templates"))
-app = FastAPI(title="SmartEstimator AI — Week 5 Day 24.1")
+try:
+    # compiled once; render() below skips the per-request loader lookup + stat
+    _INDEX_TMPL = TEMPLATES.get_template("index.html")
+except Exception:
+    _INDEX_TMPL = None  # render_home() falls back to inline HTML
+
+# Warm pipeline workers (see worker.py); size via ESTIMATE_WORKERS
+ESTIMATE_WORKERS = int(os.getenv("ESTIMATE_WORKERS", "0") or 0) or worker.default_workers()
+_WORKER_POOL: dict = {}
+
+# At most ESTIMATE_WORKERS runs hold plan images / OCR state at once; the rest wait here.
+# N at once is safe: vision writes into the run's dir and estimation runs in run_dir/work
+# (worker.run_estimation), so concurrent runs share no pipeline files.
+ESTIMATE_SEM = asyncio.Semaphore(ESTIMATE_WORKERS)
+_BACKGROUND_RUNS: set = set()  # strong refs so queued tasks aren't garbage-collected
+
+def get_worker_pool():
+    pool = _WORKER_POOL.get("pool")
+    if pool is None:
+        pool = _WORKER_POOL["pool"] = worker.create_pool(ESTIMATE_WORKERS)
+    return pool
+
+def reset_worker_pool(pool) -> None:
+    """Drop a pool whose worker died (segfault / OOM kill); the next get_worker_pool() makes a new one."""
+    if _WORKER_POOL.get("pool") is pool:
+        del _WORKER_POOL["pool"]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def in_worker(fn, *args):
+    # A dead worker breaks the executor for good: replace it so only the runs that were
+    # on it fail (BrokenProcessPool propagates), not every later /estimate
+    pool = get_worker_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        reset_worker_pool(pool)
+        raise
+
+def ensure_dirs():
+    # once per worker at startup (not on every import by a reloader); isdir avoids the mkdir when present
+    for d in (DATA_DIR, RUNS_DIR, CACHE_DIR, VISION_CACHE_DIR):
+        if not os.path.isdir(d):
+            os.makedirs(d, exist_ok=True)
+
+@asynccontextmanager
+async def lifespan(app):
+    ensure_dirs()
+    worker.warm_up(get_worker_pool(), ESTIMATE_WORKERS)
+    yield
+    pool = _WORKER_POOL.pop("pool", None)
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+app = FastAPI(title="SmartEstimator AI — Week 5 Day 24.1", lifespan=lifespan)
+
+# xlsx is a zip container, reportlab PDFs and PNGs are already compressed: gzip only costs CPU there
+PRECOMPRESSED_SUFFIXES = (".xlsx", ".pdf", ".png")
+
+class ArtifactGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes already-compressed downloads through untouched."""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith(PRECOMPRESSED_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(ArtifactGZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # ------------------------------- helpers ----------------------------------
-def run(cmd, cwd=None) -> int:
-    print("->", " ".join(map(str, cmd)))
-    r = subprocess.run(cmd, cwd=cwd)
-    return r.returncode
+def _check_prices_shape(obj) -> dict:
+    """prices.json shape: {section: {key: scalar}} or {key: scalar}; nothing deeper."""
+    if not isinstance(obj, dict):
+        raise ValueError("prices must be a JSON object")
+    for v in obj.values():
+        if isinstance(v, dict):
+            if any(isinstance(x, (dict, list)) for x in v.values()):
+                raise ValueError("prices nested deeper than section → value")
+        elif isinstance(v, list):
+            raise ValueError("prices must not contain arrays")
+    return obj
 
-def safe_json_parse(s: str) -> Optional[dict]:
+def parse_prices_json(s: str) -> Optional[dict]:
+    """None for an empty field; ValueError for invalid JSON or a bad shape (the caller answers 400)."""
     s = (s or "").strip()
     if not s:
         return None
     try:
-        return json.loads(s)
-    except Exception as e:
-        print("JSON parse error:", e)
+        obj = jsonio.loads(s)
+    except (ValueError, RecursionError) as e:  # orjson / json decode errors are ValueErrors
+        raise ValueError(f"prices_json is not valid JSON: {e}") from None
+    return _check_prices_shape(obj)
+
+def new_run_id() -> str:
+    """15 hex chars: ms timestamp + 16 random bits, so ids sort by creation time."""
+    return f"{time.time_ns() // 1_000_000:011x}{random.getrandbits(16):04x}"
+
+_RUN_ID = re.compile(r"[0-9a-f]{8,15}")
+
+def run_path(run_id: str) -> Optional[Path]:
+    """
+    runs/<id[:4]>/<id>: the first 4 hex digits of the ms timestamp change every ~3 days,
+    so each shard holds a few days of runs and RUNS_DIR itself stays small.
+    Older 8-char (uuid) run ids live flat in RUNS_DIR. None for anything else.
+    """
+    if not _RUN_ID.fullmatch(run_id):
         return None
+    if len(run_id) == 15:
+        return RUNS_DIR / run_id[:4] / run_id
+    return RUNS_DIR / run_id
+
+def run_file(run_id: str, *parts: str) -> Optional[Path]:
+    run_dir = run_path(run_id)
+    if run_dir is None or any(p in ("", ".", "..") for p in parts):
+        return None
+    return run_dir.joinpath(*parts)
+
+def save_upload(src, dst: Path) -> str:
+    """Chunked copy of the upload to dst; returns its sha256 (hashed while copying)."""
+    h = hashlib.sha256()
+    with open(dst, "wb") as f:
+        while chunk := src.read(UPLOAD_CHUNK):
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest()
+
+def artifact_manifest(out_dir: Path) -> list:
+    """Known artifact names present in out_dir (one directory read, no glob/stat per name)."""
+    try:
+        with os.scandir(out_dir) as it:
+            present = {e.name for e in it}
+    except OSError:
+        return []
+    return [name for name in ARTIFACT_NAMES if name in present]
 
 def read_json(path: Path) -> Optional[dict]:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return jsonio.read_json(path)
     except Exception:
         return None
 
-def get_last_status() -> Optional[dict]:
-    if not RUNS_DIR.exists():
-        return None
+LATEST_STATUS = RUNS_DIR / "_latest.json"
+
+# get_last_status() memo, keyed on RUNS_DIR's mtime: {"mtime": ns, "val": dict|None}
+_LAST_STATUS_CACHE: dict = {"mtime": None, "val": None}
+
+def publish_latest_status(run_id: str, payload: bytes) -> None:
+    """Atomically replace RUNS_DIR/_latest.json; the rename also bumps RUNS_DIR's mtime."""
+    tmp = RUNS_DIR / f".latest-{run_id}.tmp"
+    tmp.write_bytes(payload)
+    os.replace(tmp, LATEST_STATUS)
+
+def _scan_last_status() -> Optional[dict]:
+    # Fallback for runs created before _latest.json existed: newest status.json wins
     latest_path = None
     latest_mtime = -1.0
-    for run_dir in RUNS_DIR.iterdir():
-        if not run_dir.is_dir():
-            continue
-        s = run_dir / "status.json"
-        if s.exists():
+    with os.scandir(RUNS_DIR) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            s = os.path.join(entry.path, "status.json")
             try:
-                m = s.stat().st_mtime
-                if m > latest_mtime:
-                    latest_mtime = m
-                    latest_path = s
-            except Exception:
-                pass
+                m = os.stat(s).st_mtime
+            except OSError:
+                continue
+            if m > latest_mtime:
+                latest_mtime = m
+                latest_path = s
     if not latest_path:
         return None
+    return read_json(Path(latest_path))
+
+def get_last_status() -> Optional[dict]:
     try:
-        return json.loads(latest_path.read_text(encoding="utf-8"))
-    except Exception:
+        mtime = RUNS_DIR.stat().st_mtime_ns
+    except OSError:
         return None
+    if mtime == _LAST_STATUS_CACHE["mtime"]:
+        return _LAST_STATUS_CACHE["val"]
+    val = read_json(LATEST_STATUS) if LATEST_STATUS.exists() else _scan_last_status()
+    _LAST_STATUS_CACHE.update(mtime=mtime, val=val)
+    return val
 
 # -------------------------------- routes ----------------------------------
+# Prebuilt liveness response: no dict, encoding or response-model work per probe
+_HEALTH_RESPONSE = Response(content=b'{"ok":true}', media_type="application/json",
+                            headers={"Cache-Control": "no-store"})
+
 @app.get("/health")
-def health():
-    return {"ok": True}
+async def health():
+    return _HEALTH_RESPONSE
 
-@app.get("/", response_class=HTMLResponse)
-def form(request: Request):
-    last_status = get_last_status()
-    try:
-        return TEMPLATES.TemplateResponse(
-            "index.html",
-            {"request": request, "last_status": last_status}
-        )
-    except Exception:
-        scale_val = (last_status or {}).get("scale_ft_per_px")
-        scale_str = f"{scale_val:.6f} ft/px" if scale_val else "n/a"
-        t = (last_status or {}).get("totals") or {}
-        ta = t.get("total_area_ft2", 0)
-        tp = t.get("total_perimeter_ft", 0)
-        tw = t.get("total_wall_length_ft", 0)
-        ocr_used = (last_status or {}).get("ocr_geometry_used", False)
-        last_block = ""
-        if last_status:
-            last_block = f"""
+# Inline fallback used when templates/index.html can't be loaded or rendered
+_FALLBACK_PAGE = string.Template("""<!doctype html><html><body><div class="wrap">
+          <form action="/estimate" method="post" enctype="multipart/form-data">
+            <input type="file" name="plan" required/>
+            <button type="submit">Estimate</button>
+          </form>
+          $last_block
+        </div></body></html>""")
+_FALLBACK_LAST_RUN = string.Template("""
             <div class="card" style="margin-top:18px; padding:14px; border:1px solid #e5e7eb; border-radius:10px;">
               <h3>Last Run</h3>
-              <p><b>Run ID:</b> {last_status.get('run_id')}</p>
-              <p><b>OCR geometry used:</b> {'✅ Yes' if ocr_used else '❌ No (fallback)'}</p>
-              <p><b>Scale:</b> {scale_str}</p>
+              <p><b>Run ID:</b> $run_id</p>
+              <p><b>OCR geometry used:</b> $ocr_used</p>
+              <p><b>Scale:</b> $scale</p>
               <p>
-                <b>Total Area:</b> {ta} ft² ·
-                <b>Total Perimeter:</b> {tp} ft ·
-                <b>Total Wall Length:</b> {tw} ft
+                <b>Total Area:</b> $ta ft² ·
+                <b>Total Perimeter:</b> $tp ft ·
+                <b>Total Wall Length:</b> $tw ft
               </p>
               <p class="links">
-                <a href="/runs/{last_status.get('run_id')}/status.json">status.json</a> |
-                <a href="/runs/{last_status.get('run_id')}/metrics/metrics_area.json">metrics_area.json</a> |
-                <a href="/runs/{last_status.get('run_id')}/metrics/metrics_walls.json">metrics_walls.json</a>
+                <a href="/runs/$run_id/status.json">status.json</a> |
+                <a href="/runs/$run_id/metrics/metrics_area.json">metrics_area.json</a> |
+                <a href="/runs/$run_id/metrics/metrics_walls.json">metrics_walls.json</a>
               </p>
             </div>
-            """
-        return HTMLResponse(f"""<!doctype html><html><body><div class="wrap">
-          <form action="/estimate" method="post" enctype="multipart/form-data">
-            <input type="file" name="plan" required/>
-            <button type="submit">Estimate</button>
-          </form>
-          {last_block}
-        </div></body></html>""")
+            """)
+
+# /estimate result page (same string.Template approach as the fallback homepage)
+_RESULT_PAGE = string.Template("""
+    <div class="wrap" style="font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial; max-width:920px; margin:30px auto;">
+      <h3>Estimate Ready (Run $run_id)</h3>
+      <p><b>Status:</b> $status_note</p>
+      <p><b>Scale:</b> $scale</p>
+      <p><b>Total Area:</b> $ta ft² &nbsp;|&nbsp; <b>Total Perimeter:</b> $tp ft &nbsp;|&nbsp; <b>Total Wall Length:</b> $tw ft</p>
+      <div class="links" style="margin-top:10px">$links</div>
+      <div class="links" style="margin-top:8px; color:#64748b">
+        <a href="/runs/$run_id/status.json">status.json</a> |
+        <a href="/runs/$run_id/metrics/metrics_area.json">metrics_area.json</a> |
+        <a href="/runs/$run_id/metrics/metrics_walls.json">metrics_walls.json</a>
+      </div>
+      <p style="margin-top:16px"><a href="/">⟵ New estimate</a></p>
+    </div>
+    """)
+
+def render_home(request: Request, last_status: Optional[dict]) -> str:
+    try:
+        return _INDEX_TMPL.render({"request": request, "last_status": last_status})
+    except Exception:
+        last_block = ""
+        if last_status:
+            scale_val = last_status.get("scale_ft_per_px")
+            t = last_status.get("totals") or {}
+            last_block = _FALLBACK_LAST_RUN.substitute(
+                run_id=last_status.get("run_id"),
+                ocr_used="✅ Yes" if last_status.get("ocr_geometry_used", False) else "❌ No (fallback)",
+                scale=f"{scale_val:.6f} ft/px" if scale_val else "n/a",
+                ta=t.get("total_area_ft2", 0),
+                tp=t.get("total_perimeter_ft", 0),
+                tw=t.get("total_wall_length_ft", 0),
+            )
+        return _FALLBACK_PAGE.substitute(last_block=last_block)
+
+# Rendered homepage, reused until the last status changes: (status, utf-8 body, etag).
+# Keyed on the whole status, not the run id: the same run moves running -> done.
+_HOME_CACHE: dict = {}
+
+@app.get("/", response_class=HTMLResponse)
+def form(request: Request):
+    last_status = get_last_status()
+    page = _HOME_CACHE.get("page")
+    if page is None or page[0] != last_status:
+        body = render_home(request, last_status).encode("utf-8")  # encoded once per last status
+        page = (last_status, body, f'"{hashlib.md5(body).hexdigest()}"')
+        _HOME_CACHE["page"] = page
+    headers = {"ETag": page[2], "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == page[2]:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(page[1], headers=headers)
+
+async def process_run(run_id: str, run_dir: Path, plan_path: Path, plan_digest: str,
+                      in_height: float, us_height: float,
+                      mode: str, custom_prices: Optional[dict], known_width_ft: Optional[float],
+                      known_height_ft: Optional[float]):
+    """Vision + estimation for one saved upload; returns (status, exit_code)."""
+    out_dir = run_dir / "out"
+    mets_dir = run_dir / "metrics"
+
+    cache_key = None
+    if CACHE_MAX_BYTES > 0:
+        params = {"mode": mode, "prices": custom_prices, "in_height": in_height, "us_height": us_height,
+                  "known_width_ft": known_width_ft, "known_height_ft": known_height_ft}
+        cache_key = await run_in_threadpool(result_cache.compute_key, plan_digest, params, CACHE_INPUTS)
+        entry = result_cache.lookup(CACHE_DIR, cache_key)
+        status = None
+        if entry is not None:
+            try:
+                status = await run_in_threadpool(result_cache.restore, entry, run_dir)
+            except (OSError, ValueError):  # entry evicted mid-restore: drop partial links, run normally
+                for d in (out_dir, mets_dir):
+                    for p in d.iterdir():
+                        try:
+                            os.unlink(p)
+                        except OSError:
+                            pass
+        if status is not None:
+            if "artifacts" not in status:  # entry cached before status carried the manifest
+                status["artifacts"] = artifact_manifest(out_dir)
+            status.update(
+                run_id=run_id, state="done", cached=True,
+                metrics_area=str((mets_dir / "metrics_area.json").relative_to(APP_ROOT)),
+                metrics_walls=str((mets_dir / "metrics_walls.json").relative_to(APP_ROOT)),
+            )
+            status_bytes = jsonio.dumps(status)
+            (run_dir / "status.json").write_bytes(status_bytes)
+            publish_latest_status(run_id, status_bytes)
+            return status, 0
+
+    async with ESTIMATE_SEM:
+        prices_path = APP_ROOT / "data" / "prices.json"
+        if custom_prices:
+            temp_prices = run_dir / "prices_overrides.json"
+            jsonio.write_json(temp_prices, custom_prices, indent=False)
+            prices_path = temp_prices
+
+        manual_scale_payload = {
+            "known_width_ft": float(known_width_ft) if known_width_ft else None,
+            "known_height_ft": float(known_height_ft) if known_height_ft else None,
+        }
+        # per-run only: the vision step gets the payload directly, so no shared DATA_DIR copy to race on
+        jsonio.write_json(run_dir / "manual_scale.json", manual_scale_payload)
+
+        preproc = run_dir / "preproc.png"
+        area_json = mets_dir / "metrics_area.json"
+        walls_json = mets_dir / "metrics_walls.json"
+
+        ocr_ok = False
+        vision_key = None
+        if CACHE_MAX_BYTES > 0:
+            vision_key = result_cache.compute_key(plan_digest, manual_scale_payload, ())
+            entry = result_cache.lookup(VISION_CACHE_DIR, vision_key)
+            if entry is not None:
+                try:
+                    await run_in_threadpool(result_cache.restore, entry, run_dir, ("metrics",))
+                    ocr_ok = True
+                except (OSError, ValueError):  # entry evicted mid-restore: drop partial links
+                    for p in (area_json, walls_json):
+                        try:
+                            os.unlink(p)
+                        except OSError:
+                            pass
+
+        if not ocr_ok:
+            # preprocess → OCR → geometry fused in-process (image + OCR payload stay in memory).
+            # Outputs go straight into this run's dir (no shared vision files). Estimation below
+            # is isolated separately: it runs in run_dir/work, see worker.run_estimation.
+            ocr_ok = await in_worker(
+                worker.run_vision, plan_path, run_dir / "ocr_dims.json", area_json, walls_json,
+                manual_scale_payload, preproc
+            )
+            if ocr_ok and vision_key:
+                await run_in_threadpool(result_cache.store, VISION_CACHE_DIR, vision_key, run_dir,
+                                        {"ocr_ok": True}, CACHE_MAX_BYTES, ("metrics",))
+        if not walls_json.exists():
+            ocr_ok = False
+
+        scale_ft_per_px = None
+        totals = {"total_area_ft2": 0.0, "total_perimeter_ft": 0.0, "total_wall_length_ft": 0.0}
+        ocr_used_flag = bool(ocr_ok)
+
+        if ocr_ok and area_json.exists():
+            area_payload = read_json(area_json) or {}
+            rooms0 = (area_payload.get("rooms") or [])
+            if rooms0 and rooms0[0].get("name") == "SyntheticArea":
+                ocr_used_flag = False
+            scale_ft_per_px = area_payload.get("scale_ft_per_px")
+            t = (area_payload.get("totals") or {})
+            totals["total_area_ft2"] = t.get("total_area_ft2", 0.0)
+            totals["total_perimeter_ft"] = t.get("total_perimeter_ft", 0.0)
+            totals["total_wall_length_ft"] = t.get("total_wall_length_ft", 0.0)
+        else:
+            placeholder = {
+                "source": "ocr",
+                "scale_ft_per_px": None,
+                "rooms": [{
+                    "name": "SyntheticArea",
+                    "polygon_ft": [[0,0],[10,0],[10,10],[0,10]],
+                    "area_ft2": 100.0,
+                    "perimeter_ft": 40.0
+                }],
+                "totals": {"total_area_ft2": 100.0, "total_perimeter_ft": 40.0, "total_wall_length_ft": 0.0}
+            }
+            # replaced, not rewritten in place: after a vision-cache hit these are hardlinks into the entry
+            result_cache.replace_file(area_json, jsonio.dumps(placeholder))
+            result_cache.replace_file(walls_json, jsonio.dumps(
+                {"source":"ocr","walls":[],"totals":{"total_wall_length_ft":0.0}}))
+            totals = placeholder["totals"]
+            scale_ft_per_px = None
+            ocr_used_flag = False
+
+        status = {
+            "run_id": run_id,
+            "state": "running",
+            "ocr_geometry_used": bool(ocr_used_flag),
+            "scale_ft_per_px": scale_ft_per_px,
+            "totals": totals,
+            "metrics_area": str(area_json.relative_to(APP_ROOT)),
+            "metrics_walls": str(walls_json.relative_to(APP_ROOT)),
+            "manual_scale": manual_scale_payload,
+        }
+        status_bytes = jsonio.dumps(status)
+        (run_dir / "status.json").write_bytes(status_bytes)
+        publish_latest_status(run_id, status_bytes)
+
+        engine_args = estimator_main.build_parser().parse_args([
+            "--mode", mode,
+            "--prices", str(prices_path),
+            "--in_height_ft", str(in_height),
+            "--us_height_ft", str(us_height),
+            "--outdir", str(out_dir),
+            "--metrics_area", str(area_json),
+            "--metrics_walls", str(walls_json),
+            "--metrics_source", "ocr"
+        ])
+        # stages run inside run_dir/work (own data/output), never the shared DATA_DIR
+        code = await in_worker(worker.run_estimation, engine_args, run_dir / "work")
+
+        status["state"] = "done" if code == 0 else "failed"
+        status["artifacts"] = artifact_manifest(out_dir)
+        status_bytes = jsonio.dumps(status)
+        (run_dir / "status.json").write_bytes(status_bytes)
+        publish_latest_status(run_id, status_bytes)
+    if code == 0 and cache_key:
+        await run_in_threadpool(result_cache.store, CACHE_DIR, cache_key, run_dir, status, CACHE_MAX_BYTES)
+    return status, code
+
+async def process_queued_run(*run_args):
+    """process_run for background mode: a crash still leaves a terminal state for pollers."""
+    run_id, run_dir = run_args[0], run_args[1]
+    try:
+        return await process_run(*run_args)
+    except Exception as exc:
+        status_bytes = jsonio.dumps({"run_id": run_id, "state": "failed", "error": repr(exc)})
+        (run_dir / "status.json").write_bytes(status_bytes)
+        publish_latest_status(run_id, status_bytes)
+        raise
+
+def _queued_run_done(task: asyncio.Task) -> None:
+    _BACKGROUND_RUNS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print("Background run failed:", repr(task.exception()))
 
 @app.post("/estimate", response_class=HTMLResponse)
 async def estimate(
@@ -120,137 +489,56 @@ async def estimate(
     prices_json: str = Form(""),
     known_width_ft: Optional[float] = Form(None),
     known_height_ft: Optional[float] = Form(None),
+    background: bool = Form(False),
 ):
-    run_id = uuid.uuid4().hex[:8]
-    run_dir = RUNS_DIR / run_id
+    if len(prices_json) > PRICES_JSON_MAX:
+        return JSONResponse({"error": "prices_json too large"}, status_code=413)
+    # parsed + shape-checked once here; the run (and its cache key) use the dict.
+    # A bad override is an error, never a silent fallback to the default prices.
+    try:
+        custom_prices = parse_prices_json(prices_json) or None
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # mkdir() creates the shard on first use; a taken id still surfaces as FileExistsError
+    for _ in range(8):
+        run_id = new_run_id()
+        run_dir = run_path(run_id)
+        try:
+            run_dir.mkdir(parents=True)
+            break
+        except FileExistsError:
+            continue
+    else:
+        raise RuntimeError("could not allocate a run id")
     out_dir = run_dir / "out"
     mets_dir = run_dir / "metrics"
-    run_dir.mkdir(parents=True, exist_ok=True)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    mets_dir.mkdir(parents=True, exist_ok=True)
+    out_dir.mkdir()
+    mets_dir.mkdir()
 
     plan_ext = Path(plan.filename).suffix.lower() or ".png"
     plan_path = run_dir / ("plan" + plan_ext)
-    with open(plan_path, "wb") as f:
-        f.write(await plan.read())
-
-    custom_prices = safe_json_parse(prices_json)
-    prices_path = APP_ROOT / "data" / "prices.json"
-    if custom_prices:
-        temp_prices = run_dir / "prices_overrides.json"
-        temp_prices.write_text(json.dumps(custom_prices, indent=2), encoding="utf-8")
-        prices_path = temp_prices
-
-    manual_scale_payload = {
-        "known_width_ft": float(known_width_ft) if known_width_ft else None,
-        "known_height_ft": float(known_height_ft) if known_height_ft else None,
-    }
-    (run_dir / "manual_scale.json").write_text(json.dumps(manual_scale_payload, indent=2), encoding="utf-8")
-    (DATA_DIR / "manual_scale.json").write_text(json.dumps(manual_scale_payload, indent=2), encoding="utf-8")
-
-    ocr_ok = True
-    preproc = run_dir / "preproc.png"
-    ocr_json_tmp = DATA_DIR / "ocr_dims.json"
-    area_json_tmp = DATA_DIR / "metrics_area.json"
-    walls_json_tmp = DATA_DIR / "metrics_walls.json"
-
-    for p in (ocr_json_tmp, area_json_tmp, walls_json_tmp):
-        try:
-            if p.exists(): p.unlink()
-        except Exception:
-            pass
-
-    code = run([sys.executable, "src/vision/preprocess.py",
-                "--input", str(plan_path),
-                "--out", str(preproc),
-                "--deskew"])
-    if code != 0 or not preproc.exists():
-        ocr_ok = False
+    # open + chunked copy/hash + close all off the event loop; never holds the whole upload in RAM
+    plan_digest = await run_in_threadpool(save_upload, plan.file, plan_path)
+    await plan.close()  # drop the spooled temp copy now rather than at request teardown
 
-    if ocr_ok:
-        code = run([sys.executable, "src/vision/ocr_dims.py",
-                    "--input", str(preproc),
-                    "--out", str(ocr_json_tmp)])
-        if code != 0 or not ocr_json_tmp.exists():
-            ocr_ok = False
-
-    if ocr_ok:
-        # >>> HOT-FIX: pass --preproc to enable image-size fallback for manual scale
-        code = run([sys.executable, "src/vision/geometry_from_dims.py",
-                    "--ocr", str(ocr_json_tmp),
-                    "--out_area", str(area_json_tmp),
-                    "--out_walls", str(walls_json_tmp),
-                    "--preproc", str(preproc)])
-        if code != 0 or not walls_json_tmp.exists():
-            ocr_ok = False
+    run_args = (run_id, run_dir, plan_path, plan_digest, in_height, us_height, mode, custom_prices,
+                known_width_ft, known_height_ft)
+    if background:
+        # enqueue and return at once; clients poll /runs/{run_id}/status.json for "state"
+        jsonio.write_json(run_dir / "status.json", {"run_id": run_id, "state": "queued"})
+        task = asyncio.create_task(process_queued_run(*run_args))
+        _BACKGROUND_RUNS.add(task)
+        task.add_done_callback(_queued_run_done)
+        return JSONResponse({"run_id": run_id, "status": "queued",
+                             "status_url": f"/runs/{run_id}/status.json"}, status_code=202)
 
-    area_json = mets_dir / "metrics_area.json"
-    walls_json = mets_dir / "metrics_walls.json"
-    scale_ft_per_px = None
-    totals = {"total_area_ft2": 0.0, "total_perimeter_ft": 0.0, "total_wall_length_ft": 0.0}
-    ocr_used_flag = bool(ocr_ok)
-
-    if ocr_ok and area_json_tmp.exists():
-        shutil.copy2(area_json_tmp, area_json)
-        shutil.copy2(walls_json_tmp, walls_json)
-        area_payload = read_json(area_json) or {}
-        rooms0 = (area_payload.get("rooms") or [])
-        if rooms0 and rooms0[0].get("name") == "SyntheticArea":
-            ocr_used_flag = False
-        scale_ft_per_px = area_payload.get("scale_ft_per_px")
-        t = (area_payload.get("totals") or {})
-        totals["total_area_ft2"] = t.get("total_area_ft2", 0.0)
-        totals["total_perimeter_ft"] = t.get("total_perimeter_ft", 0.0)
-        totals["total_wall_length_ft"] = t.get("total_wall_length_ft", 0.0)
-    else:
-        placeholder = {
-            "source": "ocr",
-            "scale_ft_per_px": None,
-            "rooms": [{
-                "name": "SyntheticArea",
-                "polygon_ft": [[0,0],[10,0],[10,10],[0,10]],
-                "area_ft2": 100.0,
-                "perimeter_ft": 40.0
-            }],
-            "totals": {"total_area_ft2": 100.0, "total_perimeter_ft": 40.0, "total_wall_length_ft": 0.0}
-        }
-        area_json.write_text(json.dumps(placeholder, indent=2), encoding="utf-8")
-        walls_json.write_text(json.dumps({"source":"ocr","walls":[],"totals":{"total_wall_length_ft":0.0}}, indent=2), encoding="utf-8")
-        totals = placeholder["totals"]
-        scale_ft_per_px = None
-        ocr_used_flag = False
-
-    status = {
-        "run_id": run_id,
-        "ocr_geometry_used": bool(ocr_used_flag),
-        "scale_ft_per_px": scale_ft_per_px,
-        "totals": totals,
-        "metrics_area": str(area_json.relative_to(APP_ROOT)),
-        "metrics_walls": str(walls_json.relative_to(APP_ROOT)),
-        "manual_scale": manual_scale_payload,
-    }
-    (run_dir / "status.json").write_text(json.dumps(status, indent=2), encoding="utf-8")
-
-    engine_args = [
-        sys.executable, "src/main.py",
-        "--mode", mode,
-        "--prices", str(prices_path),
-        "--in_height_ft", str(in_height),
-        "--us_height_ft", str(us_height),
-        "--outdir", str(out_dir),
-        "--metrics_area", str(area_json),
-        "--metrics_walls", str(walls_json),
-        "--metrics_source", "ocr"
-    ]
-    code = run(engine_args)
+    status, code = await process_run(*run_args)
     if code != 0:
         return HTMLResponse("<h3>Run failed.</h3><p>Check server logs.</p>", status_code=500)
+    scale_ft_per_px = status["scale_ft_per_px"]
 
-    links = []
-    for name in ["final_estimate.xlsx","final_estimate.pdf","final_estimate_detailed.pdf","final_breakdown.json","compare_preview.png"]:
-        p = out_dir / name
-        if p.exists():
-            links.append(f'<a href="/download/{run_id}/{name}">{name}</a>')
+    links = [f'<a href="/download/{run_id}/{name}">{name}</a>' for name in status.get("artifacts", ())]
 
     if (known_width_ft or known_height_ft):
         status_note = "✅ Manual scale used (override)" if scale_ft_per_px else "✅ Manual scale requested"
@@ -262,40 +550,47 @@ async def estimate(
     scale_str = f"{status['scale_ft_per_px']:.6f} ft/px" if status["scale_ft_per_px"] else "n/a"
     ta = status["totals"]["total_area_ft2"]; tp = status["totals"]["total_perimeter_ft"]; tw = status["totals"]["total_wall_length_ft"]
 
-    return HTMLResponse(f"""
-    <div class="wrap" style="font-family: system-ui, -apple-system, Segoe UI, Roboto, Arial; max-width:920px; margin:30px auto;">
-      <h3>Estimate Ready (Run {run_id})</h3>
-      <p><b>Status:</b> {status_note}</p>
-      <p><b>Scale:</b> {scale_str}</p>
-      <p><b>Total Area:</b> {ta} ft² &nbsp;|&nbsp; <b>Total Perimeter:</b> {tp} ft &nbsp;|&nbsp; <b>Total Wall Length:</b> {tw} ft</p>
-      <div class="links" style="margin-top:10px">{' | '.join(links)}</div>
-      <div class="links" style="margin-top:8px; color:#64748b">
-        <a href="/runs/{run_id}/status.json">status.json</a> |
-        <a href="/runs/{run_id}/metrics/metrics_area.json">metrics_area.json</a> |
-        <a href="/runs/{run_id}/metrics/metrics_walls.json">metrics_walls.json</a>
-      </div>
-      <p style="margin-top:16px"><a href="/">⟵ New estimate</a></p>
-    </div>
-    """)
+    return HTMLResponse(_RESULT_PAGE.substitute(
+        run_id=run_id, status_note=status_note, scale=scale_str, ta=ta, tp=tp, tw=tw,
+        links=" | ".join(links),
+    ))
 
 # ------------------------------ downloads ----------------------------------
+class ArtifactResponse(FileResponse):
+    """FileResponse streamed in 1 MiB reads (starlette's default is 64 KiB)."""
+    chunk_size = 1 << 20
+
+# A run's artifacts are written once into its own dir and never rewritten;
+# status.json changes while the run progresses, so it is always revalidated.
+ARTIFACT_CACHE = "private, max-age=86400"
+
+def artifact_response(request: Request, p: Optional[Path], filename: str, not_found: str = "Not found",
+                      media_type: Optional[str] = None, cache_control: str = ARTIFACT_CACHE):
+    # one stat() serves the existence check, the headers and the ETag (mtime+size, no byte hashing)
+    if p is None:  # malformed run id / filename
+        return PlainTextResponse(not_found, status_code=404)
+    try:
+        st = p.stat()
+    except OSError:
+        return PlainTextResponse(not_found, status_code=404)
+    if not stat.S_ISREG(st.st_mode):
+        return PlainTextResponse(not_found, status_code=404)
+    resp = ArtifactResponse(path=p, filename=filename, stat_result=st, media_type=media_type,
+                            headers={"Cache-Control": cache_control})
+    etag = resp.headers["etag"]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return resp
+
 @app.get("/download/{run_id}/{filename}")
-def download(run_id: str, filename: str):
-    p = RUNS_DIR / run_id / "out" / filename
-    if not p.exists():
-        return PlainTextResponse("File not found", status_code=404)
-    return FileResponse(path=p, filename=filename)
+def download(request: Request, run_id: str, filename: str):
+    return artifact_response(request, run_file(run_id, "out", filename), filename, "File not found")
 
 @app.get("/runs/{run_id}/status.json")
-def get_status(run_id: str):
-    p = RUNS_DIR / run_id / "status.json"
-    if not p.exists():
-        return PlainTextResponse("Not found", status_code=404)
-    return FileResponse(path=p, filename="status.json")
+def get_status(request: Request, run_id: str):
+    return artifact_response(request, run_file(run_id, "status.json"), "status.json",
+                             media_type="application/json", cache_control="no-cache")
 
 @app.get("/runs/{run_id}/metrics/{filename}")
-def get_metrics(run_id: str, filename: str):
-    p = RUNS_DIR / run_id / "metrics" / filename
-    if not p.exists():
-        return PlainTextResponse("Not found", status_code=404)
-    return FileResponse(path=p, filename=filename)
+def get_metrics(request: Request, run_id: str, filename: str):
+    return artifact_response(request, run_file(run_id, "metrics", filename), filename)
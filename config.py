@@ -15,7 +15,8 @@ APP_ENV  = env("APP_ENV", "dev")
 PORT     = env("PORT", 8000, int)
 
 RUNS_DIR = Path(os.getenv("RUNS_DIR", "/tmp/runs"))
-RUNS_DIR.mkdir(parents=True, exist_ok=True)
+if not RUNS_DIR.is_dir():
+    RUNS_DIR.mkdir(parents=True, exist_ok=True)
 
 TESSERACT_CMD = env("TESSERACT_CMD", "")
 OCR_LANG      = env("OCR_LANG", "eng")
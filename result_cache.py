@@ -0,0 +1,112 @@
+# result_cache.py — reuse artifacts of identical /estimate runs
+"""
+On-disk memo for /estimate: the pipeline is a pure function of the plan bytes,
+the form parameters and a few input files (prices, doors/windows, flooring).
+app.py keeps two caches with this module: whole runs, and vision metrics alone.
+
+Layout: <cache_dir>/<key>/{status.json, out/*, metrics/*}
+Entries are filled with hardlinks from the finished run dir, so caching costs
+no byte copies; a hit hardlinks them back into the new run dir. A file in a
+run's out/ or metrics/ may therefore share its inode with a cache entry:
+rewrite it with replace_file(), never by opening it for writing.
+Least-recently-used entries are evicted once the cache exceeds max_bytes.
+"""
+import os, json, shutil, hashlib, time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import jsonio  # src/jsonio.py (app.py puts src/ on sys.path)
+
+SUBDIRS = ("out", "metrics")
+
+
+def compute_key(plan_digest: str, params: Dict[str, Any], input_files: Iterable[Path]) -> str:
+    """plan_digest: sha256 hex of the plan bytes (app.py hashes the upload while saving it)."""
+    h = hashlib.sha256(plan_digest.encode("ascii"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    for p in input_files:
+        try:
+            h.update(p.read_bytes())
+        except OSError:
+            h.update(b"\0missing")
+    return h.hexdigest()[:16]
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    dst.mkdir(parents=True, exist_ok=True)
+    with os.scandir(src) as it:
+        for e in it:
+            if not e.is_file():
+                continue
+            try:
+                os.link(e.path, dst / e.name)
+            except OSError:
+                shutil.copy2(e.path, dst / e.name)
+
+
+def replace_file(path: Path, data: bytes) -> None:
+    """Write path as a new inode (temp file + rename), leaving any hardlinked cache copy intact."""
+    tmp = path.with_name(f".{path.name}-{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def lookup(cache_dir: Path, key: str) -> Optional[Path]:
+    entry = cache_dir / key
+    try:
+        os.utime(entry)  # LRU touch
+    except OSError:
+        return None
+    return entry
+
+
+def restore(entry: Path, run_dir: Path, subdirs: Iterable[str] = SUBDIRS) -> Dict[str, Any]:
+    """Hardlink a cached entry into run_dir and return its cached status."""
+    for sub in subdirs:
+        if (entry / sub).is_dir():
+            _link_tree(entry / sub, run_dir / sub)
+    return jsonio.read_json(entry / "status.json")
+
+
+def store(cache_dir: Path, key: str, run_dir: Path, status: Dict[str, Any], max_bytes: int,
+          subdirs: Iterable[str] = SUBDIRS) -> None:
+    tmp = cache_dir / f".{key}-{os.getpid()}-{time.monotonic_ns()}.tmp"
+    try:
+        for sub in subdirs:
+            if (run_dir / sub).is_dir():
+                _link_tree(run_dir / sub, tmp / sub)
+        jsonio.write_json(tmp / "status.json", status)
+        os.replace(tmp, cache_dir / key)  # atomic publish; fails if a concurrent run won
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    evict(cache_dir, max_bytes)
+
+
+def _tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def evict(cache_dir: Path, max_bytes: int) -> None:
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for e in it:
+            if not e.is_dir() or e.name.startswith("."):
+                continue
+            size = _tree_size(e.path)
+            entries.append((e.stat().st_mtime, size, e.path))
+            total += size
+    entries.sort()  # oldest (least recently used) first
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -21,65 +21,121 @@ Writes:
 """
 
 from pathlib import Path
-import json, sys
+import sys
 from typing import Any, Dict, List, Tuple
 
 from openpyxl import load_workbook
-from openpyxl.styles import Alignment, Font, Border, Side, numbers
+from openpyxl.styles import Alignment, Font, Border, Side, NamedStyle, numbers
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
 
+import jsonio
+
+
+# shared, immutable style objects (openpyxl styles are value objects)
+_BOLD = Font(bold=True)
+_TITLE_FONT = Font(bold=True, size=13)
+_SHEET_TITLE_FONT = Font(bold=True, size=14)
+_THIN = Side(style="thin", color="999999")
+_BOX = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_VCENTER = Alignment(vertical="center")
+# registered once per workbook; box_style then sets one style id per cell
+_FMT_NUMBER = "#,##0.00"
+_FMT_USD = numbers.FORMAT_CURRENCY_USD_SIMPLE
+
+_NAMED_STYLES = (
+    NamedStyle(name="boq_box", font=DEFAULT_FONT, border=_BOX, alignment=_VCENTER),
+    # boxed + number format: quantities and non-USD money share the 2-decimal one
+    NamedStyle(name="boq_num", font=DEFAULT_FONT, border=_BOX, alignment=_VCENTER,
+               number_format=_FMT_NUMBER),
+    NamedStyle(name="boq_usd", font=DEFAULT_FONT, border=_BOX, alignment=_VCENTER,
+               number_format=_FMT_USD),
+)
+_HEADERS = ("Item", "Unit", "Quantity", "Rate", "Amount")
+_INFO_HEADERS = ("Metric", "Value")
+
+# per-column styles of a BOQ data row (Item, Unit, Qty, Rate, Amount), by money style
+_ROW_STYLES = {m: ("boq_box", "boq_box", "boq_num", m, m) for m in ("boq_num", "boq_usd")}
+
+_COL_LETTERS = {i: get_column_letter(i) for i in range(1, 8)}  # BOQ uses A..E
+
 
 # ---------- helpers ----------
 def load_json(p: Path, default=None):
     if p.exists():
-        with open(p, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return jsonio.read_json(p)  # orjson when installed
     return default
 
 
-def get_first(d: Dict[str, Any], candidates: List[List[str]], default=0.0):
-    """Try multiple key-paths; return first numeric value found."""
-    for path in candidates:
-        cur = d
-        ok = True
-        for k in path:
-            if isinstance(cur, dict) and k in cur:
-                cur = cur[k]
-            else:
-                ok = False
-                break
-        if ok:
-            try:
-                return float(cur)
-            except Exception:
-                continue
+# what float() raises for non-numeric input (None, "", lists, 1e400-sized ints ...)
+_NOT_A_NUMBER = (TypeError, ValueError, OverflowError)
+
+
+def section(d: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """Sub-dict d[key], or {} when missing / not a dict."""
+    v = d.get(key)
+    return v if isinstance(v, dict) else {}
+
+
+def first_num(*values, default=0.0) -> float:
+    """First value that converts to float (missing/non-numeric candidates are skipped)."""
+    for v in values:
+        if isinstance(v, float):
+            return v
+        if v is None:
+            continue
+        try:
+            return float(v)
+        except _NOT_A_NUMBER:
+            continue
     return float(default)
 
 
-def fmt_currency(ws, cell, currency_hint="INR"):
+def currency_format(currency_hint="INR"):
     # Use USD style if currency looks like USD/$, else generic 2-decimal
     if currency_hint in ("USD", "$"):
-        ws[cell].number_format = numbers.FORMAT_CURRENCY_USD_SIMPLE
-    else:
-        ws[cell].number_format = "#,##0.00"
+        return _FMT_USD
+    return _FMT_NUMBER
+
+
+def currency_style(currency_hint="INR"):
+    """Named style for boxed money cells (see _NAMED_STYLES)."""
+    return "boq_usd" if currency_format(currency_hint) == _FMT_USD else "boq_num"
+
+
+def track_widths(widths: Dict[int, int], values, first_col=1):
+    """Record the text length of values written from first_col on (for autosize)."""
+    for col, v in enumerate(values, start=first_col):
+        n = 0 if v is None else len(str(v))
+        if n > widths.get(col, -1):
+            widths[col] = n
 
 
-def autosize(ws):
-    widths = {}
-    for row in ws.iter_rows():
-        for c in row:
-            v = "" if c.value is None else str(c.value)
-            widths[c.column] = max(widths.get(c.column, 0), len(v))
+def autosize(ws, widths: Dict[int, int]):
+    """Apply widths gathered by track_widths while writing (no second pass over the sheet)."""
+    dims = ws.column_dimensions
     for col, w in widths.items():
-        ws.column_dimensions[get_column_letter(col)].width = min(max(10, w + 2), 48)
+        letter = _COL_LETTERS.get(col) or get_column_letter(col)
+        dims[letter].width = min(max(10, w + 2), 48)
 
 
-def box_style(ws, rng):
-    thin = Side(style="thin", color="999999")
-    for row in ws[rng]:
-        for c in row:
-            c.border = Border(left=thin, right=thin, top=thin, bottom=thin)
-            c.alignment = Alignment(vertical="center")
+def register_styles(wb):
+    for st in _NAMED_STYLES:
+        if st.name not in wb.named_styles:
+            wb.add_named_style(st)
+
+
+def box_style(ws, r1, c1, r2, c2, col_styles=()):
+    """
+    Apply a boxed named style to rows r1..r2, columns c1..c2 (inclusive):
+    col_styles[i] for the i-th column, "boq_box" past its end. Replaces
+    font/number format, so bold etc. must be set after this.
+    """
+    styles = [col_styles[i] if i < len(col_styles) else "boq_box" for i in range(c2 - c1 + 1)]
+    cell = ws.cell
+    for r in range(r1, r2 + 1):
+        for c, st in enumerate(styles, start=c1):
+            cell(row=r, column=c).style = st
 
 
 # ---------- build BOQ rows (INDIA / USA) ----------
@@ -90,23 +146,29 @@ def build_india_boq(india: Dict[str, Any], rates_in: Dict[str, Any]) -> List[Tup
     """
     rows = []
 
-    # Quantities (defensive candidates)
-    bricks_nos = get_first(india, [["brickwork","bricks_count_with_wastage"],
-                                   ["brickwork","bricks_count_without_wastage"],
-                                   ["bricks_with_wastage"]], 0)
-    cem_bags_bw = get_first(india, [["mortar_brickwork","cement_bags"]], 0)
-    sand_m3_bw  = get_first(india, [["mortar_brickwork","sand_m3"]], 0)
+    # Sections looked up once; quantities use defensive candidates within them
+    bw = section(india, "brickwork")
+    mb = section(india, "mortar_brickwork")
+    pl = section(india, "plaster")
+    extras = section(india, "extras")
 
-    pl_area_m2  = get_first(india, [["plaster","area_m2"]], 0)
-    pl_cem_bags = get_first(india, [["plaster","cement_bags"]], 0)
-    pl_sand_m3  = get_first(india, [["plaster","sand_m3"]], 0)
+    bricks_nos = first_num(bw.get("bricks_count_with_wastage"),
+                           bw.get("bricks_count_without_wastage"),
+                           india.get("bricks_with_wastage"))
+    cem_bags_bw = first_num(mb.get("cement_bags"))
+    sand_m3_bw  = first_num(mb.get("sand_m3"))
+
+    pl_area_m2  = first_num(pl.get("area_m2"))
+    pl_cem_bags = first_num(pl.get("cement_bags"))
+    pl_sand_m3  = first_num(pl.get("sand_m3"))
 
     # Extras from india_extras if present
-    paint_area_m2 = get_first(india, [["paint","area_m2"], ["extras","paint","area_m2"]], 0)
-    steel_kg = get_first(india, [["steel","kg"], ["extras","steel_kg"]], 0)
+    paint_area_m2 = first_num(section(india, "paint").get("area_m2"),
+                              section(extras, "paint").get("area_m2"))
+    steel_kg = first_num(section(india, "steel").get("kg"), extras.get("steel_kg"))
 
     # Brickwork volume to derive labor m3 if needed
-    brickwork_vol_m3 = get_first(india, [["derived","vol_brickwork_m3"]], 0)
+    brickwork_vol_m3 = first_num(section(india, "derived").get("vol_brickwork_m3"))
 
     # Rates
     r_brick = float(rates_in.get("brick_per_piece", 0) or 0)
@@ -156,13 +218,17 @@ def build_usa_boq(usa: Dict[str, Any], rates_us: Dict[str, Any]) -> List[Tuple[s
     """Returns rows: (Item, Unit, Qty, Rate, Amount) for USA framing style."""
     rows = []
 
-    studs = get_first(usa, [["framing","studs_pcs"], ["studs_pcs"], ["studs"]], 0)
-    plates = get_first(usa, [["framing","plates_pcs"], ["plates_pcs"], ["plates"]], 0)
-    sheath_48 = get_first(usa, [["sheathing","sheets_4x8"], ["sheathing_sheets_4x8"]], 0)
-    sheath_412 = get_first(usa, [["sheathing","sheets_4x12"], ["sheathing_sheets_4x12"]], 0)
-    drywall_48 = get_first(usa, [["drywall","sheets_4x8"], ["drywall_sheets_4x8"]], 0)
-    drywall_412 = get_first(usa, [["drywall","sheets_4x12"], ["drywall_sheets_4x12"]], 0)
-    insul_packs = get_first(usa, [["insulation","packs"], ["insulation_packs"]], 0)
+    framing = section(usa, "framing")
+    sheathing = section(usa, "sheathing")
+    drywall = section(usa, "drywall")
+
+    studs = first_num(framing.get("studs_pcs"), usa.get("studs_pcs"), usa.get("studs"))
+    plates = first_num(framing.get("plates_pcs"), usa.get("plates_pcs"), usa.get("plates"))
+    sheath_48 = first_num(sheathing.get("sheets_4x8"), usa.get("sheathing_sheets_4x8"))
+    sheath_412 = first_num(sheathing.get("sheets_4x12"), usa.get("sheathing_sheets_4x12"))
+    drywall_48 = first_num(drywall.get("sheets_4x8"), usa.get("drywall_sheets_4x8"))
+    drywall_412 = first_num(drywall.get("sheets_4x12"), usa.get("drywall_sheets_4x12"))
+    insul_packs = first_num(section(usa, "insulation").get("packs"), usa.get("insulation_packs"))
 
     # Rates
     r_2x4 = float(rates_us.get("2x4_stud_per_piece", 0) or 0)
@@ -189,9 +255,11 @@ def build_usa_boq(usa: Dict[str, Any], rates_us: Dict[str, Any]) -> List[Tuple[s
     rows.append(("Insulation Packs", "pack", insul_packs, r_ins, insul_packs * r_ins))
 
     # Labor rows
+    total_sheath = sheath_48 + sheath_412
+    total_drywall = drywall_48 + drywall_412
     rows.append(("Labor – Framing (per stud)", "pcs", studs, r_lab_stud, studs * r_lab_stud))
-    rows.append(("Labor – Sheathing (per sheet)", "sheet", sheath_48 + sheath_412, r_lab_sheath, (sheath_48 + sheath_412) * r_lab_sheath))
-    rows.append(("Labor – Drywall (per sheet)", "sheet", drywall_48 + drywall_412, r_lab_drywall, (drywall_48 + drywall_412) * r_lab_drywall))
+    rows.append(("Labor – Sheathing (per sheet)", "sheet", total_sheath, r_lab_sheath, total_sheath * r_lab_sheath))
+    rows.append(("Labor – Drywall (per sheet)", "sheet", total_drywall, r_lab_drywall, total_drywall * r_lab_drywall))
     rows.append(("Labor – Insulation (per pack)", "pack", insul_packs, r_lab_insul, insul_packs * r_lab_insul))
 
     return rows
@@ -243,74 +311,74 @@ def build_flooring_boq(flooring: Dict[str, Any]) -> List[Tuple[str, str, float,
 
 
 # ---------- writer helpers ----------
-def add_table(ws, start_row, title, rows, currency_hint="INR"):
+def add_table(ws, widths, start_row, title, rows, currency_hint="INR"):
     """Writes a titled table and returns the next empty row after the table."""
-    bold = Font(bold=True)
     r = start_row
 
-    ws[f"A{r}"] = title
-    ws[f"A{r}"].font = Font(bold=True, size=13)
+    ws.cell(row=r, column=1, value=title).font = _TITLE_FONT
+    track_widths(widths, (title,))
     r += 1
 
-    headers = ["Item", "Unit", "Quantity", "Rate", "Amount"]
-    for i, h in enumerate(headers, start=1):
-        ws.cell(row=r, column=i, value=h).font = bold
+    # header + data rows go in whole with ws.append (lands on row r: the title is the last row written)
+    ws.append(_HEADERS)
+    track_widths(widths, _HEADERS)
     r += 1
 
     start_tbl = r
-    for item, unit, qty, rate, amt in rows:
-        ws.cell(row=r, column=1, value=item)
-        ws.cell(row=r, column=2, value=unit)
-        ws.cell(row=r, column=3, value=qty)
-        ws.cell(row=r, column=4, value=rate)
-        ws.cell(row=r, column=5, value=amt)
-        # formats
-        ws[f"C{r}"].number_format = "#,##0.00"
-        fmt_currency(ws, f"D{r}", currency_hint)
-        fmt_currency(ws, f"E{r}", currency_hint)
-        r += 1
+    append = ws.append  # bound once for the row loop
+    for row in rows:
+        append(row)
+        track_widths(widths, row)
+    r += len(rows)
 
     end_tbl = r - 1
 
+    # Box header + data (numeric columns get their number format from the named style)
+    box_style(ws, start_tbl - 1, 1, start_tbl - 1, 5)
+    for col in range(1, 6):
+        ws.cell(row=start_tbl - 1, column=col).font = _BOLD
+    box_style(ws, start_tbl, 1, end_tbl, 5, _ROW_STYLES[currency_style(currency_hint)])
+
     # Add a Total row (works even if there were 0 data rows - then SUM over empty range = 0)
-    ws.cell(row=r, column=4, value="Total").font = bold
-    ws.cell(row=r, column=5, value=f"=SUM(E{start_tbl}:E{end_tbl})").font = bold
-    fmt_currency(ws, f"E{r}", currency_hint)
+    ws.cell(row=r, column=4, value="Total").font = _BOLD
+    total = ws.cell(row=r, column=5, value=f"=SUM(E{start_tbl}:E{end_tbl})")
+    total.font = _BOLD
+    total.number_format = currency_format(currency_hint)
+    track_widths(widths, ("Total", total.value), first_col=4)
     r += 2  # blank line after table
-
-    # Include header row in box
-    box_style(ws, f"A{start_tbl-1}:E{end_tbl}")
     return r
 
 
-def add_info_table(ws, start_row, title, pairs):
+def add_info_table(ws, widths, start_row, title, pairs):
     """Non-monetary info table (key/value). Returns next row."""
-    bold = Font(bold=True)
     r = start_row
-    ws[f"A{r}"] = title
-    ws[f"A{r}"].font = Font(bold=True, size=13)
+    ws.cell(row=r, column=1, value=title).font = _TITLE_FONT
+    track_widths(widths, (title,))
     r += 1
 
-    ws.cell(row=r, column=1, value="Metric").font = bold
-    ws.cell(row=r, column=2, value="Value").font = bold
+    ws.append(_INFO_HEADERS)
+    track_widths(widths, _INFO_HEADERS)
     r += 1
 
     start_tbl = r
-    for k, v in pairs:
-        ws.cell(row=r, column=1, value=k)
-        ws.cell(row=r, column=2, value=v)
+    append = ws.append
+    for pair in pairs:
+        append(pair)
+        track_widths(widths, pair)
         r += 1
     end_tbl = r - 1
 
-    box_style(ws, f"A{start_tbl-1}:B{end_tbl}")
+    box_style(ws, start_tbl - 1, 1, end_tbl, 2)
+    ws.cell(row=start_tbl - 1, column=1).font = _BOLD
+    ws.cell(row=start_tbl - 1, column=2).font = _BOLD
     r += 2
     return r
 
 
-# ---------- main ----------
-def main():
+# ---------- BOQ sheet ----------
+def add_boq_sheet(wb):
+    """(Re)build the BOQ sheet on an open workbook from the data/output JSONs; the caller saves."""
     base = Path("data/output")
-    xlsx = base / "final_estimate.xlsx"
     india_json = base / "qty_india_total.json"
     usa_json   = base / "qty_usa.json"
     doors_windows_json = base / "doors_windows.json"
@@ -318,9 +386,6 @@ def main():
     area_summary_json  = base / "area_summary.json"
     prices_json = Path("data/prices.json")
 
-    if not xlsx.exists():
-        sys.exit("[Error] Excel not found: data/output/final_estimate.xlsx. Run earlier steps first.")
-
     # Load inputs
     india = load_json(india_json, {}) or {}
     usa   = load_json(usa_json, {}) or {}
@@ -335,16 +400,15 @@ def main():
     if isinstance(prices, dict) and "GLOBAL" in prices and isinstance(prices["GLOBAL"], dict):
         currency_global = str(prices["GLOBAL"].get("currency", "") or "")
 
-    # Open workbook
-    wb = load_workbook(xlsx)
-
     # Remove old BOQ if exists (clean re-run)
     if "BOQ" in wb.sheetnames:
         wb.remove(wb["BOQ"])
     ws = wb.create_sheet("BOQ")
+    register_styles(wb)
 
-    ws["A1"] = "Bill of Quantities (BOQ)"
-    ws["A1"].font = Font(bold=True, size=14)
+    ws.cell(row=1, column=1, value="Bill of Quantities (BOQ)").font = _SHEET_TITLE_FONT
+    widths: Dict[int, int] = {}  # column -> longest text, filled while writing
+    track_widths(widths, ("Bill of Quantities (BOQ)",))
 
     # Currency hints
     in_currency_hint = currency_global if currency_global else "INR"
@@ -354,22 +418,22 @@ def main():
 
     # INDIA
     india_rows = build_india_boq(india, rates_in)
-    r = add_table(ws, r, "BOQ – INDIA", india_rows, currency_hint=in_currency_hint)
+    r = add_table(ws, widths, r, "BOQ – INDIA", india_rows, currency_hint=in_currency_hint)
 
     # USA
     usa_rows = build_usa_boq(usa, rates_us)
-    r = add_table(ws, r, "BOQ – USA", usa_rows, currency_hint=us_currency_hint)
+    r = add_table(ws, widths, r, "BOQ – USA", usa_rows, currency_hint=us_currency_hint)
 
     # OPENINGS (Doors & Windows)
     open_rows = build_openings_boq(doors_windows)
     if open_rows:
-        r = add_table(ws, r, "BOQ – OPENINGS (Doors & Windows)", open_rows,
+        r = add_table(ws, widths, r, "BOQ – OPENINGS (Doors & Windows)", open_rows,
                       currency_hint=in_currency_hint if currency_global else "USD")
 
     # FLOORING
     floor_rows = build_flooring_boq(flooring)
     if floor_rows:
-        r = add_table(ws, r, "BOQ – FLOORING", floor_rows,
+        r = add_table(ws, widths, r, "BOQ – FLOORING", floor_rows,
                       currency_hint=in_currency_hint if currency_global else "USD")
 
     # AREAS (Info only)
@@ -381,9 +445,21 @@ def main():
             ("Floor Area (m²)",       float(area_summary.get("floor_area_m2", 0) or 0)),
             ("Gross Area (m²)",       float(area_summary.get("gross_area_m2", 0) or 0)),
         ]
-        r = add_info_table(ws, r, "AREAS (Info)", pairs)
+        r = add_info_table(ws, widths, r, "AREAS (Info)", pairs)
+
+    autosize(ws, widths)
+
+
+# ---------- main ----------
+def main():
+    xlsx = Path("data/output/final_estimate.xlsx")
+    if not xlsx.exists():
+        sys.exit("[Error] Excel not found: data/output/final_estimate.xlsx. Run earlier steps first.")
 
-    autosize(ws)
+    # Open workbook: formulas kept (data_only=False); skip external-link parts and
+    # rich-text runs, which earlier steps never write and we would only re-serialize
+    wb = load_workbook(xlsx, keep_links=False, rich_text=False, keep_vba=False, data_only=False)
+    add_boq_sheet(wb)
     wb.save(xlsx)
     print("OK: BOQ sheet added/updated in", xlsx)
 
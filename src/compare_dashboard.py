@@ -23,9 +23,56 @@ from openpyxl import load_workbook, Workbook
 from openpyxl.styles import Font, Alignment, numbers
 from openpyxl.chart import BarChart, Reference
 
-# For PNG preview (separate from Excel charts rendering)
-import matplotlib.pyplot as plt
+# For PNG preview (separate from Excel charts rendering). A bare Figure renders
+# through Agg on savefig: no pyplot state and no GUI backend probing on import.
+from matplotlib.figure import Figure
+
+# Reused across runs (stage runs repeatedly in the worker processes)
+_FIG = Figure(figsize=(8, 4.5))
+# tight_layout starts from the current margins; restored before each render so a
+# reused figure lays out exactly like a fresh one
+_FRESH_MARGINS = dict(vars(_FIG.subplotpars))
+
+
+def _build_charts():
+    """
+    Both Compare charts, built once per process. They only reference cells of
+    the 'Compare' sheet, whose layout is fixed, so the same objects are valid
+    for every run; main() just anchors them on the recreated sheet.
+    """
+    # Clustered bar: Materials/Labor/Grand Total (IN vs US)
+    bar = BarChart()
+    bar.type = "col"
+    bar.title = "IN vs US – Materials / Labor / Grand Total"
+    bar.y_axis.title = "Amount"
+    bar.x_axis.title = "Category"
+
+    data = Reference(range_string="Compare!B3:C6")  # include header row 3 and rows 4..6
+    cats = Reference(range_string="Compare!A4:A6")
+    bar.add_data(data, titles_from_data=True)
+    bar.set_categories(cats)
+    bar.width = 28
+    bar.height = 14
 
+    # Percent-stacked bar: Materials vs Labor distribution by region
+    pbar = BarChart()
+    pbar.type = "col"
+    pbar.grouping = "percentStacked"
+    pbar.title = "Materials vs Labor (%) – IN vs US"
+    pbar.y_axis.title = "Percent"
+    pbar.y_axis.scaling.max = 100
+    pbar.y_axis.scaling.min = 0
+
+    data2 = Reference(range_string="Compare!B9:C11")  # header row 9 + rows 10..11
+    cats2 = Reference(range_string="Compare!A10:A11")
+    pbar.add_data(data2, titles_from_data=True)
+    pbar.set_categories(cats2)
+    pbar.width = 28
+    pbar.height = 14
+    return bar, pbar
+
+
+_BAR, _PBAR = _build_charts()
 
 def load_json(p: Path):
     with open(p, "r", encoding="utf-8") as f:
@@ -45,21 +92,22 @@ def safe_get(d, *keys, default=0.0):
 
 
 def ensure_wb(path_xlsx: Path):
+    """Existing workbook (amended in place: it holds the earlier sheets + charts), else a new one.
+
+    A new workbook is not saved here; main() saves once after adding the Compare sheet.
+    """
     if path_xlsx.exists():
-        return load_workbook(path_xlsx)
+        return load_workbook(path_xlsx, keep_links=False)
     wb = Workbook()
     ws = wb.active
     ws.title = "Summary"
-    wb.save(path_xlsx)
     return wb
 
 
-def main():
-    # Inputs
+def load_totals():
+    """(IN_mat, IN_lab, IN_tot, US_mat, US_lab, US_tot) from the region quantity JSONs."""
     in_path = Path("data/output/qty_india_total.json")
     us_path = Path("data/output/qty_usa.json")
-    xlsx_path = Path("data/output/final_estimate.xlsx")
-    png_path = Path("data/output/compare_preview.png")
 
     # Check inputs
     if not in_path.exists() and not us_path.exists():
@@ -76,9 +124,12 @@ def main():
     US_mat = safe_get(usa, "totals", "materials_cost_subtotal", default=0.0)
     US_lab = safe_get(usa, "totals", "labor_cost_subtotal", default=0.0)
     US_tot = safe_get(usa, "totals", "grand_total", default=US_mat + US_lab)
+    return IN_mat, IN_lab, IN_tot, US_mat, US_lab, US_tot
 
-    # Open workbook (create if missing)
-    wb = ensure_wb(xlsx_path)
+
+def add_compare_sheet(wb, totals):
+    """(Re)build the Compare sheet on an open workbook; the caller saves."""
+    IN_mat, IN_lab, IN_tot, US_mat, US_lab, US_tot = totals
 
     # Remove old Compare sheet
     if "Compare" in wb.sheetnames:
@@ -86,101 +137,85 @@ def main():
 
     ws = wb.create_sheet("Compare")
 
-    # Title
-    ws["A1"] = "India vs USA – Comparative Costs"
-    ws["A1"].font = Font(bold=True, size=14)
-
-    # Table headers
-    ws["A3"] = "Category"; ws["B3"] = "INDIA"; ws["C3"] = "USA"
-    for c in ("A3","B3","C3"):
-        ws[c].font = Font(bold=True)
-
-    # Rows: Materials, Labor, Grand Total
+    # Sheet content, top to bottom (ws.append; empty tuples are the blank rows 2 and 7)
+    bold = Font(bold=True)
+    num = "#,##0.00"
     rows = [
-        ("Materials", IN_mat, IN_mat if False else IN_mat),  # placeholder replaced below
+        ("India vs USA – Comparative Costs",),
+        (),
+        # Table: Materials, Labor, Grand Total (rows 3..6)
+        ("Category", "INDIA", "USA"),
+        ("Materials", IN_mat, US_mat),
+        ("Labor", IN_lab, US_lab),
+        ("Grand Total", IN_tot, US_tot),
+        (),
+        # Percent distribution table, materials vs labor only (rows 8..11)
+        ("Distribution",),
+        ("Component", "INDIA", "USA"),
+        ("Materials", IN_mat, US_mat),
         ("Labor", IN_lab, US_lab),
-        ("Grand Total", IN_tot, US_tot)
     ]
-    rows[0] = ("Materials", IN_mat, US_mat)  # fix placeholder after vars exist
-
-    r = 4
-    for name, v_in, v_us in rows:
-        ws[f"A{r}"] = name
-        ws[f"B{r}"] = v_in
-        ws[f"C{r}"] = v_us
-        ws[f"B{r}"].number_format = "#,##0.00"
-        ws[f"C{r}"].number_format = "#,##0.00"
-        r += 1
-
-    # Percent distribution table (materials vs labor only)
-    ws["A8"] = "Distribution"; ws["A8"].font = Font(bold=True)
-    ws["A9"] = "Component"; ws["B9"] = "INDIA"; ws["C9"] = "USA"
-    for c in ("A9","B9","C9"):
-        ws[c].font = Font(bold=True)
-    ws["A10"] = "Materials"; ws["B10"] = IN_mat; ws["C10"] = US_mat
-    ws["A11"] = "Labor";    ws["B11"] = IN_lab; ws["C11"] = US_lab
-    ws["B10"].number_format = ws["C10"].number_format = "#,##0.00"
-    ws["B11"].number_format = ws["C11"].number_format = "#,##0.00"
-
-    # Clustered bar: Materials/Labor/Grand Total (IN vs US)
-    bar = BarChart()
-    bar.type = "col"
-    bar.title = "IN vs US – Materials / Labor / Grand Total"
-    bar.y_axis.title = "Amount"
-    bar.x_axis.title = "Category"
-
-    data = Reference(ws, min_col=2, min_row=3, max_col=3, max_row=6)  # include header row 3 and rows 4..6
-    cats = Reference(ws, min_col=1, min_row=4, max_row=6)
-    bar.add_data(data, titles_from_data=True)
-    bar.set_categories(cats)
-    bar.width = 28
-    bar.height = 14
-    ws.add_chart(bar, "E3")
+    for row in rows:
+        ws.append(row)
 
-    # Percent-stacked bar: Materials vs Labor distribution by region
-    pbar = BarChart()
-    pbar.type = "col"
-    pbar.grouping = "percentStacked"
-    pbar.title = "Materials vs Labor (%) – IN vs US"
-    pbar.y_axis.title = "Percent"
-    pbar.y_axis.scaling.max = 100
-    pbar.y_axis.scaling.min = 0
-
-    data2 = Reference(ws, min_col=2, min_row=9, max_col=3, max_row=11)  # header row 9 + rows 10..11
-    cats2 = Reference(ws, min_col=1, min_row=10, max_row=11)
-    pbar.add_data(data2, titles_from_data=True)
-    pbar.set_categories(cats2)
-    pbar.width = 28
-    pbar.height = 14
-    ws.add_chart(pbar, "E20")
+    ws["A1"].font = Font(bold=True, size=14)
+    ws["A8"].font = bold
+    for hdr in (3, 9):
+        for c in ws[hdr]:
+            c.font = bold
+    for first, last in ((4, 6), (10, 11)):
+        for row in ws.iter_rows(min_row=first, max_row=last, min_col=2, max_col=3):
+            for c in row:
+                c.number_format = num
+
+    # Charts: module-level templates, re-anchored on the fresh sheet
+    ws.add_chart(_BAR, "E3")
+    ws.add_chart(_PBAR, "E20")
 
     # Formats & widths
     ws.column_dimensions["A"].width = 22
     ws.column_dimensions["B"].width = 18
     ws.column_dimensions["C"].width = 18
 
-    # Save workbook
-    wb.save(xlsx_path)
 
-    # -------- PNG preview with matplotlib (side-by-side bars for materials & labor) --------
+def save_preview(totals, png_path: Path):
+    """PNG preview with matplotlib (side-by-side bars for materials & labor)."""
+    IN_mat, IN_lab, _, US_mat, US_lab, _ = totals
     labels = ["Materials", "Labor"]
     IN_vals = [IN_mat, IN_lab]
     US_vals = [US_mat, US_lab]
 
-    fig = plt.figure(figsize=(8, 4.5))
+    _FIG.clear()
+    _FIG.subplots_adjust(**_FRESH_MARGINS)
+    ax = _FIG.add_subplot(111)
     x = range(len(labels))
     width = 0.35
 
-    plt.bar([i - width/2 for i in x], IN_vals, width, label="India")
-    plt.bar([i + width/2 for i in x], US_vals, width, label="USA")
-    plt.xticks(list(x), labels)
-    plt.ylabel("Amount")
-    plt.title("India vs USA – Materials & Labor")
-    plt.legend()
+    ax.bar([i - width/2 for i in x], IN_vals, width, label="India")
+    ax.bar([i + width/2 for i in x], US_vals, width, label="USA")
+    ax.set_xticks(list(x), labels)
+    ax.set_ylabel("Amount")
+    ax.set_title("India vs USA – Materials & Labor")
+    ax.legend()
     png_path.parent.mkdir(parents=True, exist_ok=True)
-    fig.tight_layout()
-    fig.savefig(png_path, dpi=150)
-    plt.close(fig)
+    _FIG.tight_layout()  # per render: fits long labels / large totals on the y axis
+    _FIG.savefig(png_path, dpi=150)
+
+
+def main():
+    xlsx_path = Path("data/output/final_estimate.xlsx")
+    png_path = Path("data/output/compare_preview.png")
+
+    totals = load_totals()
+
+    # Open workbook (create if missing)
+    wb = ensure_wb(xlsx_path)
+    add_compare_sheet(wb, totals)
+
+    # Save workbook
+    wb.save(xlsx_path)
+
+    save_preview(totals, png_path)
 
     print("OK: Comparative dashboard updated.")
     print(f"Excel: {xlsx_path}  (sheet: Compare)")
@@ -1,8 +1,10 @@
 # src/cv_lines.py
 from pathlib import Path
+import argparse
 import cv2
 import numpy as np
-import json
+
+import jsonio
 
 # Try both names so your CAD export works either way
 CANDIDATES = [Path("data/samples/plan1.png"), Path("data/samples/PLAN1.png")]
@@ -15,36 +17,73 @@ else:
 
 OUT_IMG = Path("data/samples/lines_plan1.png")
 OUT_JSON = Path("data/samples/lines_plan1.json")
+OUT_NPZ = OUT_JSON.with_suffix(".npz")  # same segments as arrays, for cv_scale
+
+# --reduce N: decode straight to 1/N size; coordinates are scaled back to full-res px
+IMREAD_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def median_u8(gray: np.ndarray) -> float:
+    """
+    Exact np.median of a uint8 image from its 256-bin histogram: one counting
+    pass (cv2.calcHist) instead of partitioning a copy of every pixel.
+    """
+    if gray.dtype != np.uint8:
+        return float(np.median(gray))
+    cum = np.cumsum(cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel())
+    n = gray.size
+    # k-th smallest pixel = first bin whose cumulative count exceeds k
+    lo, hi = np.searchsorted(cum, [(n - 1) // 2, n // 2], side="right")
+    return (lo + hi) / 2.0
 
 def auto_canny(gray: np.ndarray, sigma: float = 0.33):
     # automatic Canny thresholds based on image median
-    v = np.median(gray)
+    v = median_u8(gray)
     lower = int(max(0, (1.0 - sigma) * v))
     upper = int(min(255, (1.0 + sigma) * v))
     edges = cv2.Canny(gray, lower, upper, apertureSize=3, L2gradient=True)
     return edges, (lower, upper)
 
-def detect_lines(edges: np.ndarray):
+def detect_lines(edges: np.ndarray, reduce: int = 1):
     """
     Run Probabilistic Hough Transform.
     Tune the params if needed:
     - threshold: how many votes to accept a line (higher = fewer lines)
     - minLineLength: minimum length of a detected line (in pixels)
     - maxLineGap: merge broken segments if the gap is less than this
+    Votes/lengths are given for full resolution and divided by reduce.
+    Hough runs on the bounding box of the edge pixels only (plans are framed by
+    blank margins); endpoints are shifted back to edges coordinates.
     """
+    x, y, w, h = cv2.boundingRect(edges)  # 8-bit image: box of the non-zero pixels
+    if w == 0 or h == 0:
+        return np.empty((0, 4), np.int32)
     lines = cv2.HoughLinesP(
-        edges,
+        edges[y:y+h, x:x+w],
         rho=1,
         theta=np.pi / 180,
-        threshold=80,        # try 50–150
-        minLineLength=60,    # try 40–120 depending on scale
-        maxLineGap=10        # try 5–20
+        threshold=max(1, 80 // reduce),      # try 50–150
+        minLineLength=60 / reduce,           # try 40–120 depending on scale
+        maxLineGap=10 / reduce               # try 5–20
     )
-    return [] if lines is None else lines.reshape(-1, 4).tolist()
+    # (N, 4) int array of x1, y1, x2, y2 (kept as ndarray for vectorized math)
+    if lines is None:
+        return np.empty((0, 4), np.int32)
+    return lines.reshape(-1, 4) + np.array([x, y, x, y], np.int32)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Detect wall line segments (HoughLinesP) on the sample plan")
+    ap.add_argument("--reduce", type=int, choices=sorted(IMREAD_FLAGS), default=1,
+                    help="decode/detect at 1/N resolution; JSON stays in full-resolution px (cv_scale perpx unchanged)")
+    args = ap.parse_args(argv)
+    reduce = args.reduce
 
-def main():
     # 1) load original
-    img_color = cv2.imread(str(SAMPLE), cv2.IMREAD_COLOR)
+    img_color = cv2.imread(str(SAMPLE), IMREAD_FLAGS[reduce])
     if img_color is None:
         raise FileNotFoundError(f"Cannot read image: {SAMPLE}")
 
@@ -56,28 +95,34 @@ def main():
     edges, (lo, hi) = auto_canny(gray)
 
     # 4) HoughLinesP
-    lines = detect_lines(edges)
+    arr = detect_lines(edges, reduce)
 
-    # 5) draw lines overlay
-    overlay = img_color.copy()
-    for (x1,y1,x2,y2) in lines:
-        cv2.line(overlay, (x1,y1), (x2,y2), (0,0,255), 2)  # red lines
+    # 5) draw lines overlay (straight onto the loaded image: it is not used afterwards)
+    overlay = img_color
+    if len(arr):  # all segments in one native call (each one a 2-point open polyline)
+        segs = arr.reshape(-1, 2, 2).astype(np.int32, copy=False)
+        cv2.polylines(overlay, segs, isClosed=False, color=(0,0,255), thickness=2)  # red lines
 
     # 6) save image + json (with lengths in pixels for now)
     OUT_IMG.parent.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(str(OUT_IMG), overlay)
 
-    lines_info = []
-    for (x1,y1,x2,y2) in lines:
-        length_px = float(np.hypot(x2-x1, y2-y1))
-        lines_info.append({"p1":[x1,y1], "p2":[x2,y2], "length_px": length_px})
+    # back to full-resolution px, then all segment lengths in one ufunc call
+    if reduce > 1:
+        arr = arr * reduce
+    lines = arr.tolist()
+    lengths = np.hypot(arr[:, 2] - arr[:, 0], arr[:, 3] - arr[:, 1])
+    lines_info = [{"p1":[x1,y1], "p2":[x2,y2], "length_px": length_px}
+                  for (x1,y1,x2,y2), length_px in zip(lines, lengths.tolist())]
 
-    with open(OUT_JSON, "w", encoding="utf-8") as f:
-        json.dump({"canny_thresholds":[lo,hi], "lines": lines_info}, f, indent=2)
+    jsonio.write_json(OUT_JSON, {"canny_thresholds":[lo,hi], "lines": lines_info})
+    # written after the JSON, so cv_scale can tell a current .npz from a stale one
+    np.savez(OUT_NPZ, endpoints=arr.astype(np.int32), lengths_px=lengths)
 
     print(f"Detected {len(lines_info)} lines")
     print(f"Saved line overlay to {OUT_IMG}")
     print(f"Saved lines JSON to   {OUT_JSON}")
+    print(f"Saved lines arrays to {OUT_NPZ}")
 
 if __name__ == "__main__":
     main()
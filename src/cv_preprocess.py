@@ -1,3 +1,4 @@
+import argparse
 import cv2
 import numpy as np
 from pathlib import Path
@@ -5,20 +6,33 @@ from pathlib import Path
 SAMPLE = Path("data/samples/plan1.png")
 OUT = Path("data/samples/edges_plan1.png")
 
-def load_grayscale(path: Path):
-    img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+# reduce N: libjpeg/libpng decode straight to 1/N size (same map as area_contours)
+IMREAD_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+def load_grayscale(path: Path, reduce: int = 1):
+    img = cv2.imread(str(path), IMREAD_FLAGS[reduce])
     if img is None:
         raise FileNotFoundError(f"Cannot read image: {path}")
     return img
 
 def enhance_and_edges(gray):
-    blur = cv2.GaussianBlur(gray, (3,3), 0)
-    norm = cv2.normalize(blur, None, 0, 255, cv2.NORM_MINMAX)
-    edges = cv2.Canny(norm, 50, 150, apertureSize=3)
+    # no separate 3x3 blur pass: Canny's Sobel stage already smooths, and the
+    # L2 gradient norm keeps diagonal wall edges as clean as the blurred input did
+    norm = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+    edges = cv2.Canny(norm, 50, 150, apertureSize=3, L2gradient=True)
     return edges
 
 if __name__ == "__main__":
-    g = load_grayscale(SAMPLE)
+    ap = argparse.ArgumentParser(description="Edge preview of the sample plan")
+    ap.add_argument("--reduce", type=int, choices=sorted(IMREAD_FLAGS), default=1,
+                    help="decode at 1/N resolution (edge preview only)")
+    args = ap.parse_args()
+    g = load_grayscale(SAMPLE, args.reduce)
     e = enhance_and_edges(g)
     OUT.parent.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(str(OUT), e)
@@ -1,14 +1,35 @@
 # src/cv_scale.py
 # Convert pixel lengths (from lines_plan1.json) to real units using a manual scale.
 from pathlib import Path
-import argparse, json
+import argparse, csv
+
+import numpy as np
+
+import jsonio
 
 LINES_JSON = Path("data/samples/lines_plan1.json")
+LINES_NPZ  = LINES_JSON.with_suffix(".npz")  # written by cv_lines next to the JSON
 OUT_JSON   = Path("data/samples/lines_scaled.json")
 OUT_CSV    = Path("data/samples/lines_scaled.csv")
 
 UNITS = {"mm":1.0, "cm":10.0, "m":1000.0, "in":25.4, "ft":304.8}
 
+def load_lines():
+    """
+    Returns (p1 list, p2 list, length_px float64 array).
+    Prefers the .npz arrays (no JSON parse / per-line float()) unless the JSON
+    is newer, e.g. edited by hand or written by an older cv_lines.
+    """
+    if LINES_NPZ.exists() and LINES_NPZ.stat().st_mtime_ns >= LINES_JSON.stat().st_mtime_ns:
+        with np.load(LINES_NPZ) as z:
+            ends = z["endpoints"]
+            return ends[:, :2].tolist(), ends[:, 2:].tolist(), z["lengths_px"].astype(np.float64, copy=False)
+
+    lines = jsonio.read_json(LINES_JSON).get("lines", [])
+    # filled in place (no intermediate list); float() keeps accepting numeric strings
+    length_px = np.fromiter((float(ln["length_px"]) for ln in lines), dtype=np.float64, count=len(lines))
+    return [ln["p1"] for ln in lines], [ln["p2"] for ln in lines], length_px
+
 def main():
     ap = argparse.ArgumentParser(description="Apply manual scale: 1 px = X units")
     ap.add_argument("--unit", required=True, choices=list(UNITS.keys()),
@@ -20,37 +41,35 @@ def main():
     if not LINES_JSON.exists():
         raise FileNotFoundError(f"Missing {LINES_JSON}. Run cv_lines.py first.")
 
-    data = json.loads(LINES_JSON.read_text(encoding="utf-8"))
-    lines = data.get("lines", [])
+    p1s, p2s, length_px = load_lines()
     unit = args.unit
     perpx = args.perpx  # e.g., 0.02 ft/px
 
-    scaled = []
-    for i, ln in enumerate(lines):
-        length_px = float(ln["length_px"])
-        length_unit = length_px * perpx
-        scaled.append({
-            "index": i,
-            "p1": ln["p1"],
-            "p2": ln["p2"],
-            "length_px": length_px,
-            "length_" + unit: length_unit
-        })
+    length_unit = length_px * perpx  # one vectorized multiply for all lines
+    unit_key = "length_" + unit
+    scaled = [{
+        "index": i,
+        "p1": p1,
+        "p2": p2,
+        "length_px": px,
+        unit_key: lu
+    } for i, (p1, p2, px, lu) in enumerate(zip(p1s, p2s, length_px.tolist(), length_unit.tolist()))]
 
     # write JSON
     OUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-    json.dump({
+    jsonio.write_json(OUT_JSON, {
         "unit": unit,
         "per_pixel": perpx,
         "count": len(scaled),
         "lines": scaled
-    }, open(OUT_JSON, "w", encoding="utf-8"), indent=2)
+    })
 
     # write CSV
-    with open(OUT_CSV, "w", encoding="utf-8") as f:
-        f.write(f"index,p1,p2,length_px,length_{unit}\n")
-        for row in scaled:
-            f.write(f'{row["index"]},"{row["p1"]}","{row["p2"]}",{row["length_px"]:.2f},{row["length_"+unit]:.4f}\n')
+    with open(OUT_CSV, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["index", "p1", "p2", "length_px", unit_key])
+        w.writerows((row["index"], row["p1"], row["p2"],
+                     f'{row["length_px"]:.2f}', f'{row[unit_key]:.4f}') for row in scaled)
 
     print(f"Applied scale: 1 px = {perpx} {unit}")
     print(f"Scaled {len(scaled)} line(s)")
@@ -37,51 +37,74 @@ def preprocess_for_ocr(img_bgr: np.ndarray) -> np.ndarray:
     # Otsu binarization
     _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    # If mostly dark (black background), invert so text becomes black on white
-    if np.mean(th) < 127:
-        th = cv2.bitwise_not(th)
+    # If mostly dark (black background), invert so text becomes black on white.
+    # countNonZero * 255 < 127 * size is np.mean(th) < 127 without a float pass;
+    # inverted in place rather than into a copy
+    if cv2.countNonZero(th) * 255 < 127 * th.size:
+        cv2.bitwise_not(th, dst=th)
 
     # Slight dilation to connect thin strokes
     th = cv2.dilate(th, cv2.getStructuringElement(cv2.MORPH_RECT, (2,2)), 1)
     return th
 
+def ink_roi(bin_img: np.ndarray, pad: int = 8):
+    """(x, y, w, h) bounding all dark (ink) pixels plus a margin; whole image if blank."""
+    h_img, w_img = bin_img.shape[:2]
+    pts = cv2.findNonZero(cv2.bitwise_not(bin_img))
+    if pts is None:
+        return 0, 0, w_img, h_img
+    x, y, w, h = cv2.boundingRect(pts)
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(w_img, x + w + pad), min(h_img, y + h + pad)
+    return x0, y0, x1 - x0, y1 - y0
+
 def run_ocr(bin_img: np.ndarray):
-    # PSM 11 = sparse text, good for drawings
-    config = r"--oem 3 --psm 11"
+    # PSM 11 = sparse text, good for drawings; OEM 1 = LSTM only (no legacy engine load)
+    config = r"--oem 1 --psm 11"
+    # one tesseract call on the inked region only (plan margins are blank);
+    # boxes are shifted back to full-image coordinates
+    x0, y0, w, h = ink_roi(bin_img)
     data = pytesseract.image_to_data(
-        bin_img, lang="eng",
+        bin_img[y0:y0 + h, x0:x0 + w], lang="eng",
         output_type=pytesseract.Output.DICT,
         config=config
     )
+    data["left"] = [int(v) + x0 for v in data["left"]]
+    data["top"] = [int(v) + y0 for v in data["top"]]
     return data
 
 LABEL_PAT = re.compile(r"(door|window|kitchen|bed|bedroom|toilet|bath|hall|living)", re.I)
 # simple dimension patterns like 10', 3'6", 13', 3", 100
 DIM_PAT   = re.compile(r"^\s*\d+\s*(\'\s*\d+\s*\")?$|^\s*\d+\s*\'$|^\s*\d+\s*\"$")
+# typographic double/single primes -> plain quotes, in one translate() pass
+PRIMES = str.maketrans({"″": '"', "′": "'"})
 
 def annotate(img_bgr: np.ndarray, ocr_data: dict):
-    overlay = img_bgr.copy()
+    """Draws boxes/labels on img_bgr in place (callers that need the original pass a copy)."""
+    overlay = img_bgr
     results = {"labels": [], "dimensions": [], "other": []}
 
-    n = len(ocr_data["text"])
-    for i in range(n):
-        text = (ocr_data["text"][i] or "").strip()
+    texts, confs = ocr_data["text"], ocr_data["conf"]
+    lefts, tops = ocr_data["left"], ocr_data["top"]
+    widths, heights = ocr_data["width"], ocr_data["height"]
+    for i in range(len(texts)):
+        text = (texts[i] or "").strip()
         try:
-            conf = float(ocr_data["conf"][i])
+            conf = float(confs[i])
         except:
             conf = -1.0
         if not text or conf < 60:  # keep only confident detections
             continue
 
-        x = int(ocr_data["left"][i])
-        y = int(ocr_data["top"][i])
-        w = int(ocr_data["width"][i])
-        h = int(ocr_data["height"][i])
+        x = int(lefts[i])
+        y = int(tops[i])
+        w = int(widths[i])
+        h = int(heights[i])
 
         # classify
         if LABEL_PAT.search(text):
             cat, color = "labels", (0, 200, 0)     # green
-        elif DIM_PAT.search(text.replace("″", '"').replace("′", "'")) or any(c in text for c in ["'", '"']):
+        elif DIM_PAT.fullmatch(text.translate(PRIMES)) or "'" in text or '"' in text:
             cat, color = "dimensions", (200, 200, 0)  # yellow-ish
         else:
             cat, color = "other", (0, 140, 255)   # orange
@@ -98,7 +121,7 @@ if __name__ == "__main__":
     img = load_color(SAMPLE)
     bin_img = preprocess_for_ocr(img)
     ocr_data = run_ocr(bin_img)
-    annotated, results = annotate(img.copy(), ocr_data)
+    annotated, results = annotate(img, ocr_data)  # img is not needed after this
 
     OUT_IMG.parent.mkdir(parents=True, exist_ok=True)
     cv2.imwrite(str(OUT_IMG), annotated)
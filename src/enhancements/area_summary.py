@@ -9,7 +9,11 @@ Collects total areas from:
 and produces a combined summary at data/output/area_summary.json.
 """
 
-import os, json
+import os
+
+import numpy as np
+
+import jsonio  # src/jsonio.py (src/ is on sys.path when run via main.py)
 
 DATA = {
     "walls_file": "data/samples/metrics_walls.json",
@@ -18,17 +22,16 @@ DATA = {
     "out_file":  "data/output/area_summary.json"
 }
 
-def read_json(path):
+def read_json(path, cached=False):
+    """cached=True: shared per-process copy (jsonio.read_json_cached) - only for inputs we never mutate."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return (jsonio.read_json_cached if cached else jsonio.read_json)(path)
     except Exception:
         return None
 
 def write_json(path, data):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    jsonio.write_json(path, data)
 
 def extract_wall_area(data):
     if not isinstance(data, dict):
@@ -47,12 +50,11 @@ def extract_wall_area(data):
 
 def extract_openings_area(data):
     """Sum door/window areas (each × count)."""
-    total = 0.0
-    for cat in ["doors", "windows"]:
-        for item in data.get(cat, []):
-            a = item.get("area_m2_each", 0) * item.get("count", 0)
-            total += float(a)
-    return round(total, 2)
+    items = [item for cat in ["doors", "windows"] for item in data.get(cat, [])]
+    n = len(items)
+    each = np.fromiter((float(it.get("area_m2_each", 0)) for it in items), dtype=np.float64, count=n)
+    count = np.fromiter((float(it.get("count", 0)) for it in items), dtype=np.float64, count=n)
+    return round(sum((each * count).tolist(), 0.0), 2)
 
 def extract_floor_area(data):
     if not isinstance(data, dict):
@@ -66,7 +68,7 @@ def extract_floor_area(data):
 def main():
     print("[Enh] area_summary: computing...")
 
-    walls = read_json(DATA["walls_file"]) or {}
+    walls = read_json(DATA["walls_file"], cached=True) or {}
     openings = read_json(DATA["doors_file"]) or {}
     floor = read_json(DATA["floor_file"]) or {}
 
@@ -14,8 +14,12 @@ Rates (per m²) priority:
     { "doors": { "D1": 120.0 }, "windows": { "W1": 80.0 } }
 """
 
+import copy
 import os
-import json
+
+import numpy as np
+
+import jsonio  # src/jsonio.py (src/ is on sys.path when run via main.py)
 
 IN_DIR   = os.path.join("data", "inputs")
 OUT_DIR  = os.path.join("data", "output")
@@ -39,22 +43,15 @@ TEMPLATE = {
     "notes": "Edit counts/sizes/rates. If rates are 0, prices.json may override."
 }
 
-def read_json(path):
+def read_json(path, cached=False):
+    """cached=True: shared per-process copy (jsonio.read_json_cached) - only for inputs we never mutate."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return (jsonio.read_json_cached if cached else jsonio.read_json)(path)
     except Exception:
         return None
 
 def write_json(path, payload):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-
-def mm_to_m(v):
-    return float(v) / 1000.0
-
-def mm2_to_m2(w_mm, h_mm):
-    return mm_to_m(w_mm) * mm_to_m(h_mm)
+    jsonio.write_json(path, payload)
 
 def get_price(prices, category, typ, default=0.0):
     try:
@@ -101,30 +98,36 @@ def merge_from_metrics(manual_items, metrics, category_key):
     return merged
 
 def compute(items, prices, category):
-    total = 0.0
-    out_items = []
-    for it in items:
-        t = str(it.get("type", "UNK"))
-        w = float(it.get("width_mm", 0))
-        h = float(it.get("height_mm", 0))
-        c = int(it.get("count", 0))
-
-        area_each = mm2_to_m2(w, h)
-        in_rate   = float(it.get("rate_per_m2", 0.0))
-        rate      = in_rate if in_rate > 0 else get_price(prices, category, t, 0.0)
-        amount    = round(area_each * c * rate, 2)
-
-        total += amount
-        out_items.append({
+    # per-item math as array ops; rounding and the total stay in Python float
+    # (round() + in-order sum), matching what the JSON consumers always saw
+    n = len(items)
+    types = [str(it.get("type", "UNK")) for it in items]
+    w = np.fromiter((float(it.get("width_mm", 0)) for it in items), dtype=np.float64, count=n)
+    h = np.fromiter((float(it.get("height_mm", 0)) for it in items), dtype=np.float64, count=n)
+    c = [int(it.get("count", 0)) for it in items]
+    r_in = np.fromiter((float(it.get("rate_per_m2", 0.0)) for it in items), dtype=np.float64, count=n)
+
+    rates = r_in.copy()
+    for i in np.flatnonzero(r_in <= 0):
+        rates[i] = get_price(prices, category, types[i], 0.0)
+
+    areas = w * h / 1e6  # mm² -> m², one constant instead of two /1000
+    amounts = [round(a, 2) for a in (areas * np.array(c, dtype=np.float64) * rates).tolist()]
+
+    out_items = [
+        {
             "type": t,
-            "width_mm": w,
-            "height_mm": h,
-            "count": c,
-            "area_m2_each": round(area_each, 3),
-            "rate_per_m2": round(rate, 2),
-            "amount": amount
-        })
-    return out_items, round(total, 2)
+            "width_mm": wi,
+            "height_mm": hi,
+            "count": ci,
+            "area_m2_each": round(a, 3),
+            "rate_per_m2": round(r, 2),
+            "amount": amt
+        }
+        for t, wi, hi, ci, a, r, amt in zip(types, w.tolist(), h.tolist(), c,
+                                            areas.tolist(), rates.tolist(), amounts)
+    ]
+    return out_items, round(sum(amounts, 0.0), 2)
 
 def main():
     print("[Enh] doors_windows: computing...")
@@ -134,11 +137,11 @@ def main():
         write_json(IN_FILE, TEMPLATE)
         print(f"[Enh] doors_windows: created template at {IN_FILE} — please edit counts/rates if needed.")
 
-    manual = read_json(IN_FILE) or TEMPLATE
-    prices = read_json(PRICES_FILE) or {}
+    manual = read_json(IN_FILE) or copy.deepcopy(TEMPLATE)  # workers reuse this module: never mutate TEMPLATE
+    prices = read_json(PRICES_FILE, cached=True) or {}
 
     # Optionally merge counts/sizes from metrics_walls.json (non-blocking)
-    metrics = read_json(METRICS_FILE) or {}
+    metrics = read_json(METRICS_FILE, cached=True) or {}
     manual["doors"]   = merge_from_metrics(manual.get("doors", []),   metrics, "doors")
     manual["windows"] = merge_from_metrics(manual.get("windows", []), metrics, "windows")
 
@@ -13,7 +13,10 @@ Computes flooring cost = area_m2 × (1 + wastage%) × rate_per_m2
 and saves results to data/output/flooring.json.
 """
 
-import os, json
+import copy
+import os
+
+import jsonio  # src/jsonio.py (src/ is on sys.path when run via main.py)
 
 IN_DIR   = os.path.join("data", "inputs")
 OUT_DIR  = os.path.join("data", "output")
@@ -33,16 +36,15 @@ TEMPLATE = {
     "notes": "Edit wastage% and rate. If rate=0, it will use 'flooring' rate from prices.json if found."
 }
 
-def read_json(path):
+def read_json(path, cached=False):
+    """cached=True: shared per-process copy (jsonio.read_json_cached) - only for inputs we never mutate."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return (jsonio.read_json_cached if cached else jsonio.read_json)(path)
     except Exception:
         return None
 
-def write_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+def write_json(path, data, indent=True):
+    jsonio.write_json(path, data, indent=indent)
 
 def get_area():
     """Try multiple sources for total area (m²)."""
@@ -70,8 +72,8 @@ def main():
         write_json(IN_FILE_INPUT, TEMPLATE)
         print(f"[Enh] flooring: created template at {IN_FILE_INPUT}")
 
-    manual = read_json(IN_FILE_INPUT) or TEMPLATE
-    prices = read_json(PRICES_FILE) or {}
+    manual = read_json(IN_FILE_INPUT) or copy.deepcopy(TEMPLATE)
+    prices = read_json(PRICES_FILE, cached=True) or {}
 
     material    = manual.get("material", "tiles")
     wastage_pct = float(manual.get("wastage_pct", 0))
@@ -97,7 +99,8 @@ def main():
         }
     }
 
-    write_json(OUT_FILE, payload)
+    # compact: only read back by later stages (the input template above stays indented for editing)
+    write_json(OUT_FILE, payload, indent=False)
     print(f"[Enh] flooring: wrote {OUT_FILE}")
 
 if __name__ == "__main__":
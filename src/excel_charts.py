@@ -13,6 +13,16 @@ from pathlib import Path
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment
 from openpyxl.chart import PieChart, BarChart, Reference
+from openpyxl.utils import get_column_letter
+
+import jsonio  # src/jsonio.py (src/ is on sys.path when run via main.py)
+
+# Shared style objects (one instance each instead of a new Font per cell)
+_BOLD = Font(bold=True)
+_BOLD12 = Font(bold=True, size=12)
+_BOLD14 = Font(bold=True, size=14)
+_CENTER = Alignment(horizontal="center")
+_LEFT = Alignment(horizontal="left")
 
 # Enhancement JSON file paths
 ENH_FILES = {
@@ -23,23 +33,27 @@ ENH_FILES = {
 
 def read_json(path):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return jsonio.read_json(path)
     except Exception:
         return None
 
-def auto_fit(ws):
-    """Auto-size Excel columns."""
-    for col_cells in ws.columns:
-        max_length = 0
-        col = col_cells[0].column_letter
-        for cell in col_cells:
-            try:
-                if cell.value is not None:
-                    max_length = max(max_length, len(str(cell.value)))
-            except Exception:
-                pass
-        ws.column_dimensions[col].width = max_length + 2
+def track_widths(widths, values, first_col=1):
+    """Record the text length of values written from first_col on (for apply_widths)."""
+    for col, v in enumerate(values, start=first_col):
+        n = 0 if v is None else len(str(v))
+        if n > widths.get(col, -1):
+            widths[col] = n
+
+def append_row(ws, widths, values):
+    """ws.append() that also records each column's longest text for apply_widths."""
+    ws.append(values)
+    track_widths(widths, values)
+
+def apply_widths(ws, widths):
+    """Auto-size columns from append_row's record (no second pass over the cells)."""
+    dims = ws.column_dimensions
+    for col in range(1, max(widths, default=0) + 1):
+        dims[get_column_letter(col)].width = widths.get(col, 0) + 2
 
 def _to_cell_value(v):
     """Convert Python objects to something Excel can store."""
@@ -52,25 +66,24 @@ def _to_cell_value(v):
 
 def add_table(ws, data):
     """Write dict or list[dict] to the worksheet (safely)."""
+    widths = {}
     if isinstance(data, dict):
-        r = 1
         for k, v in data.items():
-            ws[f"A{r}"] = k
-            ws[f"B{r}"] = _to_cell_value(v)
-            ws[f"A{r}"].font = Font(bold=True)
-            r += 1
+            append_row(ws, widths, (k, _to_cell_value(v)))
+        for (cell,) in ws.iter_rows(max_col=1):
+            cell.font = _BOLD
     elif isinstance(data, list):
         if not data:
             ws["A1"] = "No data available"
             return
         headers = list(data[0].keys())
-        ws.append(headers)
+        append_row(ws, widths, headers)
         for row in data:
-            ws.append([_to_cell_value(row.get(h, "")) for h in headers])
+            append_row(ws, widths, [_to_cell_value(row.get(h, "")) for h in headers])
         for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-    auto_fit(ws)
+            cell.font = _BOLD
+            cell.alignment = _CENTER
+    apply_widths(ws, widths)
 
 def integrate_enhancements(wb):
     """Add enhancement sheets if their JSONs exist."""
@@ -79,21 +92,22 @@ def integrate_enhancements(wb):
         if not data:
             continue
 
-        # Create or clear the sheet
+        # Recreate the sheet in its old position: dropping it discards all old cells at
+        # once (clearing them in place also left ws.append writing below row 200)
         if sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            for row in ws["A1:Z200"]:
-                for c in row:
-                    c.value = None
+            idx = wb.sheetnames.index(sheet_name)
+            wb.remove(wb[sheet_name])
+            ws = wb.create_sheet(sheet_name, idx)
         else:
             ws = wb.create_sheet(sheet_name)
 
         # Write data
         if sheet_name == "Doors_Windows":
-            ws.append(["Category", "Type", "Count", "Area m² (each)", "Rate per m²", "Amount"])
+            widths = {}
+            append_row(ws, widths, ["Category", "Type", "Count", "Area m² (each)", "Rate per m²", "Amount"])
             for cat in ["doors", "windows"]:
                 for it in data.get(cat, []):
-                    ws.append([
+                    append_row(ws, widths, [
                         cat.capitalize(),
                         it.get("type", ""),
                         it.get("count", 0),
@@ -101,10 +115,14 @@ def integrate_enhancements(wb):
                         it.get("rate_per_m2", 0),
                         it.get("amount", 0),
                     ])
-            ws.append([])
+            # one blank spacer row, then just the two non-empty totals cells
+            r = ws.max_row + 2
             totals = data.get("totals", {})
-            ws.append(["", "", "", "", "Total", totals.get("total_amount", 0)])
-            auto_fit(ws)
+            total_row = ("Total", totals.get("total_amount", 0))
+            for col, v in enumerate(total_row, start=5):
+                ws.cell(row=r, column=col, value=v)
+            track_widths(widths, total_row, first_col=5)
+            apply_widths(ws, widths)
 
         elif sheet_name in ("Flooring", "Area_Summary"):
             add_table(ws, data)
@@ -123,15 +141,15 @@ def create_charts(wb):
 
     # Title
     ws["A1"] = "Visualization – Final Estimate"
-    ws["A1"].font = Font(bold=True, size=14)
+    ws["A1"].font = _BOLD14
 
     # Grand Total callout (Summary!B12)
     ws["A3"] = "Grand Total"
-    ws["A3"].font = Font(bold=True, size=12)
+    ws["A3"].font = _BOLD12
     ws["B3"] = ws_sum["B12"].value  # copy the number
     ws["B3"].number_format = ws_sum["B5"].number_format or "#,##0.00"
-    ws["B3"].font = Font(bold=True, size=14)
-    ws["B3"].alignment = Alignment(horizontal="left")
+    ws["B3"].font = _BOLD14
+    ws["B3"].alignment = _LEFT
 
     # Pie: Materials vs Labor (Summary!A5:A6 and B5:B6)
     pie = PieChart()
@@ -163,18 +181,23 @@ def create_charts(wb):
 
     print("OK: Charts added to Excel.")
 
+def update_workbook(wb):
+    """Enhancement sheets + Charts on an open workbook (sheets_finalize saves once for all builders)."""
+    # Step 1: add enhancement sheets (non-breaking)
+    integrate_enhancements(wb)
+
+    # Step 2: rebuild Charts sheet (your original)
+    create_charts(wb)
+
 def main():
     xlsx_path = Path("data/output/final_estimate.xlsx")
     if not xlsx_path.exists():
         sys.exit("[Error] Excel not found. Run rates_export.py first to generate data/output/final_estimate.xlsx")
 
-    wb = load_workbook(xlsx_path)
+    # amended in place, so formulas stay (no data_only); skip what this script never uses
+    wb = load_workbook(xlsx_path, keep_links=False, rich_text=False, keep_vba=False)
 
-    # Step 1: add enhancement sheets (non-breaking)
-    integrate_enhancements(wb)
-
-    # Step 2: rebuild Charts sheet (your original)
-    create_charts(wb)
+    update_workbook(wb)
 
     wb.save(xlsx_path)
     print(f"Updated workbook: {xlsx_path}")
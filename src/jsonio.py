@@ -0,0 +1,69 @@
+# src/jsonio.py
+"""
+JSON helpers shared by the API and the pipeline scripts.
+
+Uses orjson when it is installed (much faster encode/decode, notably on the
+polygon-heavy metrics payloads) and falls back to the stdlib json module
+otherwise. Both paths produce UTF-8 bytes with 2-space indentation (or compact
+separators with indent=False).
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = True) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    return loads(Path(path).read_bytes())
+
+
+# read_json_cached: path -> ((mtime_ns, size, inode), parsed object)
+_CACHE: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+_CACHE_MAX = 32
+
+
+def read_json_cached(path: Union[str, Path]) -> Any:
+    """
+    read_json memoized per process, keyed by the file's (mtime, size, inode):
+    pipeline stages run in the same worker, so inputs that several stages read
+    (prices.json, vision metrics) are parsed once until the file changes.
+    The returned object is shared between callers: treat it as read-only.
+    """
+    key = os.fspath(path)
+    st = os.stat(key)
+    sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+    hit = _CACHE.get(key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    obj = read_json(key)
+    if len(_CACHE) >= _CACHE_MAX:
+        _CACHE.clear()
+    _CACHE[key] = (sig, obj)
+    return obj
+
+
+def write_json(path: Union[str, Path], obj: Any, indent: bool = True) -> None:
+    Path(path).write_bytes(dumps(obj, indent=indent))
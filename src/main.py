@@ -11,16 +11,34 @@ What’s new vs your previous Day-23 script:
     walls: payload["totals"]["total_wall_length_ft"]  (or len(segments)>0)
 """
 
-import argparse, subprocess, sys, shutil, json
+import argparse, importlib, os, sys, shutil, json
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 
-def run(cmd, cwd=None):
-    print("-> " + " ".join(map(str, cmd)))
-    r = subprocess.run(cmd, cwd=cwd)
-    if r.returncode != 0:
-        sys.exit(r.returncode)
+# Stage modules run by run_pipeline() (worker.py pre-imports them)
+STAGES = ("qty_india", "qty_india_extras", "qty_usa", "rates_export",
+          "enhancements.area_summary", "enhancements.doors_windows", "enhancements.flooring",
+          "sheets_finalize", "pdf_detailed")
+
+
+def run(module: str, argv: Optional[List[str]] = None):
+    """
+    Runs a stage's main() in this process (imports are paid once, not per stage/run).
+    Same contract as the old `python src/<stage>.py` subprocess: a failing stage
+    exits the runner with its code; sys.exit("[Error] ...") messages go to stderr.
+    """
+    print("-> " + " ".join([module] + (argv or [])))
+    stage = importlib.import_module(module)
+    try:
+        stage.main() if argv is None else stage.main(argv)
+    except SystemExit as e:
+        if e.code is None or e.code == 0:
+            return
+        if not isinstance(e.code, int):
+            print(e.code, file=sys.stderr)
+            sys.exit(1)
+        sys.exit(e.code)
 
 
 def file_exists(p) -> bool:
@@ -30,7 +48,10 @@ def file_exists(p) -> bool:
 def copy_if_exists(src: Path, dst_dir: Path):
     if src.exists():
         dst_dir.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst_dir / src.name)
+        # copy + rename: an existing dst may be a hardlink into the API's result cache
+        tmp = dst_dir / f".{src.name}.tmp"
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst_dir / src.name)
         print(f"[copy] {src} -> {dst_dir / src.name}")
     else:
         print(f"[warn] artifact not found: {src}")
@@ -45,7 +66,7 @@ def load_json_silent(path: Path) -> Optional[dict]:
     return None
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description="SmartEstimator one-shot runner (Day-24)")
     ap.add_argument("--mode", choices=["india", "usa", "both", "all"], default="all",
                     help="'all' = india + usa + exports + charts + pdf")
@@ -71,9 +92,19 @@ def main():
     ap.add_argument("--metrics_area", type=str, default=None)
     ap.add_argument("--metrics_walls", type=str, default=None)
     ap.add_argument("--metrics_source", choices=["ocr", "sample"], default="ocr")
-
-    args = ap.parse_args()
-
+    ap.add_argument("--skip_compare", action="store_true",
+                    help="Skip the India-vs-USA dashboard (implied by --mode india/usa)")
+    return ap
+
+
+def run_pipeline(args: argparse.Namespace):
+    """
+    Runs the whole pipeline for already-parsed args.
+    Importable so app.py can call it in-process instead of spawning src/main.py.
+    A failing stage still raises SystemExit with that stage's return code.
+    Stages read/write cwd-relative data/ paths: worker.run_estimation runs each
+    API run in its own work dir, so concurrent runs never share data/output.
+    """
     DATA_OUTPUT = Path("data/output")
     DATA_OUTPUT.mkdir(parents=True, exist_ok=True)
 
@@ -131,14 +162,14 @@ def main():
 
     # 1) INDIA quantities
     if args.mode in ("india", "both", "all"):
-        run([sys.executable, "src/qty_india.py",
+        run("qty_india", [
              "--height", str(args.in_height_ft),
              "--unit", "ft",
              "--ext_thk_mm", "230", "--int_thk_mm", "115",
              "--walls", str(walls_candidate),
              "--out_json", str(DATA_OUTPUT / "qty_india.json"),
              "--out_csv",  str(DATA_OUTPUT / "qty_india.csv")])
-        run([sys.executable, "src/qty_india_extras.py",
+        run("qty_india_extras", [
              "--base", str(DATA_OUTPUT / "qty_india.json"),
              "--prices", args.prices,
              "--int_openings_m2", str(args.in_int_openings_m2),
@@ -148,7 +179,7 @@ def main():
 
     # 2) USA quantities
     if args.mode in ("usa", "both", "all"):
-        run([sys.executable, "src/qty_usa.py",
+        run("qty_usa", [
              "--height_ft", str(args.us_height_ft),
              "--spacing_in", "16", "--stud_size", "2x4",
              "--openings_ext_sqft", str(args.us_openings_ext_sqft),
@@ -159,7 +190,7 @@ def main():
 
     # 3) Rates + XLSX/PDF summary export
     if args.mode in ("both", "all", "india", "usa"):
-        run([sys.executable, "src/rates_export.py",
+        run("rates_export", [
              "--prices", args.prices,
              "--in_json", str(DATA_OUTPUT / "qty_india_total.json"),
              "--us_json", str(DATA_OUTPUT / "qty_usa.json"),
@@ -168,32 +199,33 @@ def main():
              "--out_json", str(DATA_OUTPUT / "final_breakdown.json")])
 
     # 3.5) Enhancements
-    run([sys.executable, "src/enhancements/area_summary.py"])
-    run([sys.executable, "src/enhancements/doors_windows.py"])
-    run([sys.executable, "src/enhancements/flooring.py"])
+    run("enhancements.area_summary")
+    run("enhancements.doors_windows")
+    run("enhancements.flooring")
 
-    # 4) Excel charts
-    run([sys.executable, "src/excel_charts.py"])
+    # 4) Workbook sheets in one load/save: Charts + enhancement sheets, Compare dashboard
+    #    (needs both regions; single-region modes would compare stale files), BOQ
+    compare = args.mode in ("both", "all") and not args.skip_compare
+    run("sheets_finalize", ["--compare"] if compare else [])
 
-    # 5) Compare dashboard
-    run([sys.executable, "src/compare_dashboard.py"])
-
-    # 6) Enhanced detailed PDF
-    run([sys.executable, "src/pdf_detailed.py"])
-
-    # 7) BOQ sheet
-    run([sys.executable, "src/boq_excel.py"])
+    # 5) Enhanced detailed PDF (reads the JSONs only, not the workbook)
+    run("pdf_detailed")
 
     # Copy artifacts for API
     copy_if_exists(DATA_OUTPUT / "final_estimate.xlsx", OUTDIR)
     copy_if_exists(DATA_OUTPUT / "final_estimate.pdf",  OUTDIR)
     copy_if_exists(DATA_OUTPUT / "final_breakdown.json", OUTDIR)
     copy_if_exists(DATA_OUTPUT / "final_estimate_detailed.pdf", OUTDIR)
-    copy_if_exists(DATA_OUTPUT / "compare_preview.png", OUTDIR)
+    if compare:
+        copy_if_exists(DATA_OUTPUT / "compare_preview.png", OUTDIR)
 
     print("\nOK: Pipeline completed.")
     print("Artifacts in:", OUTDIR.resolve())
 
 
+def main():
+    run_pipeline(build_parser().parse_args())
+
+
 if __name__ == "__main__":
     main()
@@ -23,7 +23,7 @@ def parse_ratio(s: str):
     a, b = s.split(":")
     return float(a), float(b)
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="India quantities (bricks, cement, sand, plaster)")
     ap.add_argument("--walls", default="data/samples/metrics_walls.json",
                     help="metrics_walls.json (from Day-5)")
@@ -53,7 +53,7 @@ def main():
                     help="Exterior wall sides to plaster (default 1)")
     ap.add_argument("--out_json", default="data/output/qty_india.json")
     ap.add_argument("--out_csv", default="data/output/qty_india.csv")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     walls_path = Path(args.walls)
     if not walls_path.exists():
@@ -21,7 +21,7 @@ def try_load(p: Path):
 def clamp_nonneg(x: float) -> float:
     return x if x > 0 else 0.0
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="India extras: paint, basic steel, labor, cost merge")
     ap.add_argument("--base", default="data/output/qty_india.json",
                     help="Day-7 output JSON to extend")
@@ -51,7 +51,7 @@ def main():
     # Outputs
     ap.add_argument("--out_json", default="data/output/qty_india_total.json")
     ap.add_argument("--out_csv",  default="data/output/qty_india_total.csv")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     base_path = Path(args.base)
     if not base_path.exists():
@@ -25,7 +25,7 @@ def try_load(p: Path):
 
 def ceil(x): return math.ceil(x)
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="USA-mode framing and finishes")
     ap.add_argument("--walls", default="data/samples/metrics_walls.json",
                     help="metrics_walls.json with totals.sum_exterior_{unit} and totals.sum_interior_{unit}")
@@ -76,7 +76,7 @@ def main():
 
     ap.add_argument("--out_json", default="data/output/qty_usa.json")
     ap.add_argument("--out_csv",  default="data/output/qty_usa.csv")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     walls_path = Path(args.walls)
     if not walls_path.exists():
@@ -192,7 +192,7 @@ def build_pdf(path_pdf: Path, currency: str, summary: Dict[str, float], details:
 
     doc.build(story)
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Rates loader + Excel/PDF exports")
     ap.add_argument("--prices", required=True, help="data/prices.json")
     ap.add_argument("--in_json", default="data/output/qty_india_total.json", help="India merged quantities JSON (optional)")
@@ -201,7 +201,7 @@ def main():
     ap.add_argument("--out_xlsx", default="data/output/final_estimate.xlsx")
     ap.add_argument("--out_pdf",  default="data/output/final_estimate.pdf")
     ap.add_argument("--out_json", default="data/output/final_breakdown.json")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     prices_path = Path(args.prices)
     if not prices_path.exists():
@@ -0,0 +1,55 @@
+# src/sheets_finalize.py
+"""
+Adds every post-export sheet to data/output/final_estimate.xlsx in one pass:
+- Doors_Windows / Flooring / Area_Summary + Charts  (excel_charts)
+- Compare + compare_preview.png                      (compare_dashboard, --compare)
+- BOQ                                                (boq_excel)
+
+Same result as running those three scripts back-to-back, but the workbook is
+loaded and saved once instead of three times.
+
+Run:
+  python src/sheets_finalize.py [--compare]
+"""
+
+from pathlib import Path
+import argparse, sys
+
+from openpyxl import load_workbook
+
+import excel_charts, compare_dashboard, boq_excel
+
+XLSX_PATH = Path("data/output/final_estimate.xlsx")
+PNG_PATH = Path("data/output/compare_preview.png")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Charts + Compare + BOQ sheets with a single workbook save")
+    ap.add_argument("--compare", action="store_true",
+                    help="also build the India-vs-USA Compare sheet and PNG preview")
+    args = ap.parse_args(argv)
+
+    if not XLSX_PATH.exists():
+        sys.exit("[Error] Excel not found. Run rates_export.py first to generate data/output/final_estimate.xlsx")
+
+    # before any work, so a missing-inputs error leaves the workbook untouched
+    totals = compare_dashboard.load_totals() if args.compare else None
+
+    # amended in place: formulas kept (no data_only), parts no step writes are skipped
+    wb = load_workbook(XLSX_PATH, keep_links=False, rich_text=False, keep_vba=False)
+
+    excel_charts.update_workbook(wb)
+    if totals is not None:
+        compare_dashboard.add_compare_sheet(wb, totals)
+    boq_excel.add_boq_sheet(wb)
+
+    wb.save(XLSX_PATH)
+    print(f"Updated workbook: {XLSX_PATH}")
+
+    if totals is not None:
+        compare_dashboard.save_preview(totals, PNG_PATH)
+        print(f"Preview PNG: {PNG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
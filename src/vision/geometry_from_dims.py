@@ -5,7 +5,7 @@ OCR-first + Manual Scale Override, with image-size fallback.
 
 What this version does:
 1) Estimates feet-per-pixel scale from OCR dimension annotations (median).
-2) If manual scale provided via data/output/manual_scale.json (known width OR height in feet),
+2) If manual scale provided via manual_scale.json (known width OR height in feet; --manual_scale),
    it overrides ft_per_px using:
    - union bbox of detected shapes (preferred), OR
    - the preprocessed image size (when bbox not available).
@@ -22,6 +22,7 @@ CLI:
   --out_area  Path to write metrics_area.json
   --out_walls Path to write metrics_walls.json
   --preproc   Path to preprocessed image (for image-size fallback)
+  --manual_scale Path to manual_scale.json (default: data/output/manual_scale.json)
 """
 
 from __future__ import annotations
@@ -144,8 +145,7 @@ def _bbox_union_px(walls: List[Dict[str, Any]], rooms: List[Dict[str, Any]]) ->
 def _synthesize_small_box_ft() -> List[List[float]]:
     return [[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]]
 
-def _read_manual_scale_json(shared_dir: Path) -> Dict[str, Optional[float]]:
-    p = shared_dir / "manual_scale.json"
+def _read_manual_scale_json(p: Path) -> Dict[str, Optional[float]]:
     try:
         if p.exists():
             return json.loads(p.read_text(encoding="utf-8"))
@@ -153,9 +153,24 @@ def _read_manual_scale_json(shared_dir: Path) -> Dict[str, Optional[float]]:
         pass
     return {"known_width_ft": None, "known_height_ft": None}
 
-def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path,
-                  preproc_path: str = "") -> Dict[str, Any]:
-    data = json.loads(ocr_json_path.read_text(encoding="utf-8"))
+def _image_size(preproc_path: str) -> Optional[Tuple[int, int]]:
+    if not preproc_path:
+        return None
+    try:
+        with Image.open(preproc_path) as im:
+            return im.size
+    except Exception:
+        return None
+
+def compute_metrics(data: Dict[str, Any], manual_scale: Dict[str, Optional[float]],
+                    img_size: Optional[Tuple[int, int]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Pure in-memory core of build_metrics().
+    data:         OCR payload ({"dims": [...], "rooms": [...], "walls": [...]})
+    manual_scale: {"known_width_ft": .., "known_height_ft": ..}
+    img_size:     (width, height) of the preprocessed image, for the manual-scale fallback
+    Returns (area_payload, walls_payload).
+    """
     dims: List[Dict[str, Any]] = data.get("dims", []) or []
     rooms_px: List[Dict[str, Any]] = data.get("rooms", []) or []
     walls_px: List[Dict[str, Any]] = data.get("walls", []) or []
@@ -169,8 +184,7 @@ def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path
         scale_source = "ocr"
 
     # 1.5) Manual scale override
-    shared_dir = Path("data/output")
-    ms = _read_manual_scale_json(shared_dir)
+    ms = manual_scale or {}
     kw = ms.get("known_width_ft") or None
     kh = ms.get("known_height_ft") or None
 
@@ -186,19 +200,15 @@ def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path
             elif kh is not None and px_h > 0:
                 ft_per_px = float(kh) / px_h
                 scale_source = "manual"; manual_used = True
-        elif preproc_path:
+        elif img_size:
             # Fallback to full image size if no bbox yet
-            try:
-                with Image.open(preproc_path) as im:
-                    img_w, img_h = im.size
-                if kw is not None and img_w > 0:
-                    ft_per_px = float(kw) / float(img_w)
-                    scale_source = "manual"; manual_used = True
-                elif kh is not None and img_h > 0:
-                    ft_per_px = float(kh) / float(img_h)
-                    scale_source = "manual"; manual_used = True
-            except Exception:
-                pass
+            img_w, img_h = img_size
+            if kw is not None and img_w > 0:
+                ft_per_px = float(kw) / float(img_w)
+                scale_source = "manual"; manual_used = True
+            elif kh is not None and img_h > 0:
+                ft_per_px = float(kh) / float(img_h)
+                scale_source = "manual"; manual_used = True
 
     # 2) Weak heuristic → default
     if ft_per_px is None:
@@ -241,34 +251,30 @@ def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path
         bbox_px = _bbox_union_px(walls_px, rooms_px)
 
         # If manual scale was used but no bbox/rooms exist, synthesize GrossArea from image
-        if manual_used and not bbox_px and preproc_path:
-            try:
-                with Image.open(preproc_path) as im:
-                    img_w, img_h = im.size
-
-                # If only one of width/height was provided, infer the other using aspect ratio
-                if kw is not None and kh is None and img_w > 0:
-                    kh = kw * (float(img_h) / float(img_w))
-                if kh is not None and kw is None and img_h > 0:
-                    kw = kh * (float(img_w) / float(img_h))
-
-                if kw is not None and kh is not None:
-                    # Build rectangle directly in feet from kw × kh
-                    poly_ft = [[0.0, 0.0], [kw, 0.0], [kw, kh], [0.0, kh]]
-                else:
-                    # Fall back to image rectangle scaled by ft_per_px
-                    poly_px = [[0.0, 0.0], [img_w, 0.0], [img_w, img_h], [0.0, img_h]]
-                    poly_ft = _scale_poly(poly_px, ft_per_px)
+        if manual_used and not bbox_px and img_size:
+            img_w, img_h = img_size
+
+            # If only one of width/height was provided, infer the other using aspect ratio
+            if kw is not None and kh is None and img_w > 0:
+                kh = kw * (float(img_h) / float(img_w))
+            if kh is not None and kw is None and img_h > 0:
+                kw = kh * (float(img_w) / float(img_h))
+
+            if kw is not None and kh is not None:
+                # Build rectangle directly in feet from kw × kh
+                poly_ft = [[0.0, 0.0], [kw, 0.0], [kw, kh], [0.0, kh]]
+            else:
+                # Fall back to image rectangle scaled by ft_per_px
+                poly_px = [[0.0, 0.0], [img_w, 0.0], [img_w, img_h], [0.0, img_h]]
+                poly_ft = _scale_poly(poly_px, ft_per_px)
 
-                area, perim = _shoelace_area_and_perim(poly_ft)
-                rooms_ft = [{
-                    "name": "GrossArea",
-                    "polygon_ft": poly_ft,
-                    "area_ft2": round(area, 3),
-                    "perimeter_ft": round(perim, 3)
-                }]
-            except Exception:
-                pass
+            area, perim = _shoelace_area_and_perim(poly_ft)
+            rooms_ft = [{
+                "name": "GrossArea",
+                "polygon_ft": poly_ft,
+                "area_ft2": round(area, 3),
+                "perimeter_ft": round(perim, 3)
+            }]
 
     # Still nothing? use bbox if present, else tiny synthetic
     if not rooms_ft:
@@ -311,10 +317,6 @@ def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path
     total_perim = round(sum(r["perimeter_ft"] for r in rooms_ft), 3)
     total_wall_len = round(sum(w["length_ft"] for w in walls_ft), 3)
 
-    # 7) Write files
-    out_area_path.parent.mkdir(parents=True, exist_ok=True)
-    out_walls_path.parent.mkdir(parents=True, exist_ok=True)
-
     area_payload = {
         "source": "ocr",
         "scale_ft_per_px": ft_per_px,
@@ -331,23 +333,33 @@ def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path
         "walls": walls_ft,
         "totals": {"total_wall_length_ft": total_wall_len}
     }
+    return area_payload, walls_payload
+
+def write_metrics(area_payload: Dict[str, Any], walls_payload: Dict[str, Any],
+                  out_area_path: Path, out_walls_path: Path) -> Dict[str, Any]:
+    out_area_path.parent.mkdir(parents=True, exist_ok=True)
+    out_walls_path.parent.mkdir(parents=True, exist_ok=True)
 
     out_area_path.write_text(json.dumps(area_payload, indent=2), encoding="utf-8")
     out_walls_path.write_text(json.dumps(walls_payload, indent=2), encoding="utf-8")
 
     return {
         "ocr_geometry_used": True,
-        "scale_ft_per_px": ft_per_px,
-        "scale_source": scale_source,
-        "totals": {
-            "total_area_ft2": total_area,
-            "total_perimeter_ft": total_perim,
-            "total_wall_length_ft": total_wall_len
-        },
+        "scale_ft_per_px": area_payload["scale_ft_per_px"],
+        "scale_source": area_payload["scale_source"],
+        "totals": dict(area_payload["totals"]),
         "area_path": str(out_area_path),
         "walls_path": str(out_walls_path)
     }
 
+def build_metrics(ocr_json_path: Path, out_area_path: Path, out_walls_path: Path,
+                  preproc_path: str = "",
+                  manual_scale_path: Path = Path("data/output/manual_scale.json")) -> Dict[str, Any]:
+    data = json.loads(ocr_json_path.read_text(encoding="utf-8"))
+    ms = _read_manual_scale_json(manual_scale_path)
+    area_payload, walls_payload = compute_metrics(data, ms, _image_size(preproc_path))
+    return write_metrics(area_payload, walls_payload, out_area_path, out_walls_path)
+
 # ---------------------------------- CLI -----------------------------------
 def main():
     ap = argparse.ArgumentParser(
@@ -357,6 +369,8 @@ def main():
     ap.add_argument("--out_area", default="data/output/metrics_area.json", help="Path to write metrics_area.json")
     ap.add_argument("--out_walls", default="data/output/metrics_walls.json", help="Path to write metrics_walls.json")
     ap.add_argument("--preproc", default="", help="Path to preprocessed image (for fallback size)")
+    ap.add_argument("--manual_scale", default="data/output/manual_scale.json",
+                    help="Path to manual_scale.json (known_width_ft / known_height_ft)")
     args = ap.parse_args()
 
     ocr_path = Path(args.ocr)
@@ -366,7 +380,8 @@ def main():
     if not ocr_path.exists():
         raise SystemExit(f"[ERR] OCR JSON not found: {ocr_path}")
 
-    result = build_metrics(ocr_path, area_path, walls_path, preproc_path=args.preproc)
+    result = build_metrics(ocr_path, area_path, walls_path, preproc_path=args.preproc,
+                           manual_scale_path=Path(args.manual_scale))
 
     t = result["totals"]
     print(f"[OK] Wrote {area_path} and {walls_path}")
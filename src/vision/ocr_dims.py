@@ -39,19 +39,26 @@ def parse_dimension(text: str):
     return None
 
 
-def extract_text(image_path: Path) -> str:
+def load_image(image_path: Path):
     img = cv2.imread(str(image_path))
     if img is None:
         raise SystemExit(f"[ERR] Cannot read: {image_path}")
-    
+    return img
+
+
+def extract_text_from_image(img) -> str:
     config = "--psm 6 -c tessedit_char_whitelist=0123456789xX'\"’"
     raw = pytesseract.image_to_string(img, config=config)
     return raw
 
 
-def process(input_path: Path, out_json: Path):
-    print("[run] OCR on:", input_path)
-    raw = extract_text(input_path)
+def extract_text(image_path: Path) -> str:
+    return extract_text_from_image(load_image(image_path))
+
+
+def extract_dims(img) -> dict:
+    """OCR an in-memory image and return the {"dims": [...]} payload written by process()."""
+    raw = extract_text_from_image(img)
     
     lines = [line.strip() for line in raw.splitlines() if line.strip()]
     
@@ -60,9 +67,15 @@ def process(input_path: Path, out_json: Path):
         val = parse_dimension(line)
         if val:
             dims.append({"text": line, "feet": val})
+    return {"dims": dims}
+
+
+def process(input_path: Path, out_json: Path):
+    print("[run] OCR on:", input_path)
+    payload = extract_dims(load_image(input_path))
     
     out_json.parent.mkdir(parents=True, exist_ok=True)
-    out_json.write_text(json.dumps({"dims": dims}, indent=2))
+    out_json.write_text(json.dumps(payload, indent=2))
     
     print(f"[OK] OCR dims saved: {out_json}")
 
@@ -0,0 +1,49 @@
+# src/vision/pipeline.py
+"""
+Fused vision pipeline: preprocess → OCR dims → geometry, in one process.
+
+Same result as running preprocess.py, ocr_dims.py and geometry_from_dims.py
+back-to-back, but the preprocessed image and OCR payload stay in memory
+between stages instead of round-tripping through PNG/JSON files.
+
+Writes (only once every stage succeeded):
+  - ocr_json    (OCR dims payload)
+  - area_json   (metrics_area.json)
+  - walls_json  (metrics_walls.json)
+  - preproc_path, if given (debug copy of the preprocessed image)
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+
+import cv2
+
+import jsonio
+from vision import preprocess, ocr_dims, geometry_from_dims
+
+
+def run_vision(plan_path: Path, ocr_json: Path, area_json: Path, walls_json: Path,
+               manual_scale: Optional[Dict[str, Optional[float]]] = None,
+               preproc_path: Optional[Path] = None) -> bool:
+    """Returns True when OCR geometry was produced, False on any stage failure."""
+    try:
+        print(f"[run] Vision pipeline: {plan_path}")
+        img = preprocess.load_image(Path(plan_path))
+        bw = preprocess.preprocess_image(img, deskew=True)
+        if preproc_path:
+            cv2.imwrite(str(preproc_path), bw)
+
+        ocr_payload = ocr_dims.extract_dims(bw)
+        h, w = bw.shape[:2]
+        area_payload, walls_payload = geometry_from_dims.compute_metrics(
+            ocr_payload, manual_scale or {}, img_size=(w, h)
+        )
+    except (Exception, SystemExit) as e:
+        print(f"[warn] Vision pipeline failed: {e}")
+        return False
+
+    Path(ocr_json).parent.mkdir(parents=True, exist_ok=True)
+    jsonio.write_json(ocr_json, ocr_payload)
+    geometry_from_dims.write_metrics(area_payload, walls_payload, Path(area_json), Path(walls_json))
+    print(f"[OK] Vision metrics saved: {area_json}, {walls_json}")
+    return True
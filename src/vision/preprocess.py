@@ -6,12 +6,15 @@ Week 5 · Day 20 — Image Preprocessing for OCR
 - adaptive threshold (binarize)
 - optional deskew (Hough-lines based)
 Saves an intermediate image ready for OCR.
+PDF plans: page 1 is rendered with poppler's pdftocairo (must be on PATH).
 
 Usage:
   python src/vision/preprocess.py --input data/samples/plan1.jpg --out runs/test/preproc.png --deskew
 """
 
 import argparse
+import shutil
+import subprocess
 from pathlib import Path
 import cv2
 import numpy as np
@@ -21,15 +24,47 @@ def ensure_dir(p: Path):
     p.parent.mkdir(parents=True, exist_ok=True)
 
 
+MAX_SIDE = 3000  # longest side kept for processing
+# Uploaded PDFs are untrusted: bound what one render may cost a pool worker
+PDF_MAX_BYTES = 50 * 1024 * 1024
+PDF_RENDER_TIMEOUT = 60  # seconds
+
+
+def render_pdf_page(path: Path, page: int = 1) -> np.ndarray:
+    """
+    Render one PDF page with poppler's pdftocairo straight to MAX_SIDE px,
+    piped through stdout (no temp PNG, no full-DPI render + resize).
+    """
+    exe = shutil.which("pdftocairo")
+    if exe is None:
+        raise SystemExit("[ERR] PDF plans need poppler's pdftocairo on PATH")
+    if path.stat().st_size > PDF_MAX_BYTES:
+        raise SystemExit(f"[ERR] PDF larger than {PDF_MAX_BYTES // (1024 * 1024)} MB: {path}")
+    try:
+        r = subprocess.run(
+            [exe, "-png", "-singlefile", "-f", str(page), "-l", str(page),
+             "-scale-to", str(MAX_SIDE), str(path), "-"],
+            capture_output=True, timeout=PDF_RENDER_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:  # run() has already killed pdftocairo
+        raise SystemExit(f"[ERR] Rendering PDF page {page} timed out after {PDF_RENDER_TIMEOUT}s: {path}")
+    img = cv2.imdecode(np.frombuffer(r.stdout, np.uint8), cv2.IMREAD_COLOR) if r.returncode == 0 else None
+    if img is None:
+        raise SystemExit(f"[ERR] Could not render PDF page {page}: {path}")
+    return img
+
+
 def load_image(path: Path) -> np.ndarray:
+    if Path(path).suffix.lower() == ".pdf":
+        return render_pdf_page(Path(path))
     img = cv2.imread(str(path))
     if img is None:
         raise SystemExit(f"[ERR] Could not read input image: {path}")
     # If image is very large, downscale to keep processing snappy (max 3000 px longest side)
     h, w = img.shape[:2]
     longest = max(h, w)
-    if longest > 3000:
-        scale = 3000.0 / longest
+    if longest > MAX_SIDE:
+        scale = float(MAX_SIDE) / longest
         img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
         print(f"[info] Downscaled to {img.shape[1]}x{img.shape[0]} for processing.")
     return img
@@ -93,13 +128,8 @@ def rotate_image(img: np.ndarray, angle_deg: float) -> np.ndarray:
     return rotated
 
 
-def preprocess(input_path: Path, output_path: Path, deskew: bool = False) -> None:
-    print(f"[run] Preprocess: {input_path}  {output_path} (deskew={deskew})")
-    ensure_dir(output_path)
-
-    # 1) load
-    img = load_image(input_path)
-
+def preprocess_image(img: np.ndarray, deskew: bool = False) -> np.ndarray:
+    """Steps 2-5 on an already-loaded image; returns the binarized (optionally deskewed) array."""
     # 2) grayscale
     gray = to_grayscale(img)
 
@@ -117,6 +147,18 @@ def preprocess(input_path: Path, output_path: Path, deskew: bool = False) -> Non
             bw = rotate_image(bw, angle)
         else:
             print("[info] Deskew angle small; skipping rotate.")
+    return bw
+
+
+def preprocess(input_path: Path, output_path: Path, deskew: bool = False) -> None:
+    print(f"[run] Preprocess: {input_path}  {output_path} (deskew={deskew})")
+    ensure_dir(output_path)
+
+    # 1) load
+    img = load_image(input_path)
+
+    # 2-5) grayscale → denoise → threshold → deskew
+    bw = preprocess_image(img, deskew=deskew)
 
     # 6) Save
     ok = cv2.imwrite(str(output_path), bw)
@@ -127,7 +169,7 @@ def preprocess(input_path: Path, output_path: Path, deskew: bool = False) -> Non
 
 def main():
     ap = argparse.ArgumentParser(description="Week 5 Day 20: Image preprocessing")
-    ap.add_argument("--input", required=True, help="Path to the input plan image (jpg/png)")
+    ap.add_argument("--input", required=True, help="Path to the input plan image (jpg/png, or pdf: first page)")
     ap.add_argument("--out", required=True, help="Where to save the preprocessed image (png recommended)")
     ap.add_argument("--deskew", action="store_true", help="Try to auto-deskew using Hough lines")
     args = ap.parse_args()
@@ -0,0 +1,8 @@
+# tests/conftest.py — make the app modules (repo root) and pipeline stages (src/) importable
+import sys
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+for p in (APP_ROOT, APP_ROOT / "src"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
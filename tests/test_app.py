@@ -0,0 +1,478 @@
+# tests/test_app.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+import jsonio
+
+PLAN = b"\x89PNG\r\n\x1a\n fake plan bytes"
+AREA = {"source": "ocr", "scale_ft_per_px": 0.05, "rooms": [{"name": "Room 1"}],
+        "totals": {"total_area_ft2": 250.0, "total_perimeter_ft": 64.0, "total_wall_length_ft": 80.0}}
+
+
+class FakeWorker:
+    """Stands in for app.in_worker: writes what the vision / estimation stages would, in-process."""
+
+    def __init__(self):
+        self.calls = []
+        self.work_dirs = []
+        self.vision_ok = True
+        self.estimation_error = None
+
+    async def __call__(self, fn, *args):
+        self.calls.append(fn.__name__)
+        if fn is app.worker.run_vision:
+            plan_path, ocr_json, area_json, walls_json, manual_scale, preproc = args
+            if not self.vision_ok:
+                return False
+            jsonio.write_json(area_json, AREA)
+            jsonio.write_json(walls_json, {"source": "ocr", "walls": [], "totals": {"total_wall_length_ft": 80.0}})
+            return True
+        if fn is app.worker.run_estimation:
+            engine_args, work_dir = args
+            self.work_dirs.append(work_dir)
+            if self.estimation_error is not None:
+                raise self.estimation_error
+            out = Path(engine_args.outdir)
+            (out / "final_estimate.xlsx").write_bytes(b"PK fake workbook " + str(work_dir).encode())
+            jsonio.write_json(out / "final_breakdown.json", {"grand_total": 1})
+            return 0
+        raise AssertionError(f"unexpected worker call {fn!r}")
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """app with runs/ under tmp_path and the worker pool replaced by FakeWorker."""
+    monkeypatch.setattr(app, "APP_ROOT", tmp_path)
+    monkeypatch.setattr(app, "DATA_DIR", tmp_path / "data" / "output")
+    monkeypatch.setattr(app, "RUNS_DIR", tmp_path / "runs")
+    monkeypatch.setattr(app, "CACHE_DIR", tmp_path / "runs" / "_cache")
+    monkeypatch.setattr(app, "VISION_CACHE_DIR", tmp_path / "runs" / "_vision_cache")
+    monkeypatch.setattr(app, "LATEST_STATUS", tmp_path / "runs" / "_latest.json")
+    monkeypatch.setattr(app, "_LAST_STATUS_CACHE", {"mtime": None, "val": None})
+    monkeypatch.setattr(app, "_HOME_CACHE", {})
+    monkeypatch.setattr(app, "_WORKER_POOL", {})
+    monkeypatch.setattr(app.worker, "create_pool", lambda n: None)
+    monkeypatch.setattr(app.worker, "warm_up", lambda pool, n: None)
+    fake = FakeWorker()
+    monkeypatch.setattr(app, "in_worker", fake)
+    return fake
+
+
+@pytest.fixture
+def client(env):
+    with TestClient(app.app) as c:  # runs the lifespan: ensure_dirs() under tmp_path
+        yield c
+
+
+def post_estimate(client, plan=PLAN, **form):
+    return client.post("/estimate", files={"plan": ("plan.png", plan, "image/png")},
+                       data={k: str(v) for k, v in form.items()})
+
+
+def run_id_of(resp):
+    return resp.text.split("(Run ", 1)[1].split(")", 1)[0]
+
+
+def run_status_files():
+    """status.json of every run dir (runs/<shard>/<run_id>; the cache dirs start with "_")."""
+    return sorted(app.RUNS_DIR.glob("[0-9a-f]*/*/status.json"))
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """in_worker() backed by a bare 1-worker spawn pool (no cv2/tesseract pre-imports)."""
+    monkeypatch.setattr(app, "_WORKER_POOL", {})
+    monkeypatch.setattr(app.worker, "create_pool", lambda n: ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")))
+    yield app._WORKER_POOL
+    pool = app._WORKER_POOL.pop("pool", None)
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def test_dead_worker_fails_its_run_and_the_pool_is_replaced(small_pool):
+    async def scenario():
+        first = app.get_worker_pool()
+        with pytest.raises(BrokenProcessPool):
+            await app.in_worker(os._exit, 1)  # the worker dies like a segfault / OOM kill would
+        assert small_pool.get("pool") is not first
+        pid = await app.in_worker(os.getpid)
+        assert pid != os.getpid()
+        assert app.get_worker_pool() is not first
+
+    asyncio.run(scenario())
+
+
+def test_finished_run_is_published_as_latest(client, env):
+    resp = post_estimate(client)
+    assert resp.status_code == 200
+    run_id = run_id_of(resp)
+    latest = jsonio.read_json(app.LATEST_STATUS)
+    assert latest["run_id"] == run_id
+    assert latest["state"] == "done"
+    assert latest["artifacts"] == ["final_estimate.xlsx", "final_breakdown.json"]
+    assert app.get_last_status() == latest
+    assert latest == client.get(f"/runs/{run_id}/status.json").json()
+
+
+def publish(status):
+    app.publish_latest_status(status["run_id"], jsonio.dumps(status))
+    st = app.RUNS_DIR.stat()  # coarse fs timestamps: make sure get_last_status() sees a new mtime
+    os.utime(app.RUNS_DIR, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_homepage_etag_and_304(client):
+    publish({"run_id": "0000000000a0001", "state": "done", "totals": AREA["totals"]})
+    first = client.get("/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert "0000000000a0001" in first.text
+    again = client.get("/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+
+def test_homepage_rerenders_when_the_same_run_changes(client):
+    status = {"run_id": "0000000000a0001", "state": "running", "ocr_geometry_used": False,
+              "totals": {"total_area_ft2": 100.0, "total_perimeter_ft": 40.0, "total_wall_length_ft": 0.0}}
+    publish(status)
+    etag = client.get("/").headers["etag"]
+
+    publish(dict(status, state="done", ocr_geometry_used=True, totals=AREA["totals"]))
+    resp = client.get("/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert "250.0" in resp.text
+
+
+def test_placeholder_after_vision_cache_hit_leaves_the_entry_intact(client, env, monkeypatch):
+    real_vision = app.worker.run_vision
+
+    async def area_only(fn, *args):  # vision "succeeds" but writes no walls file
+        if fn is real_vision:
+            jsonio.write_json(args[2], AREA)
+            return True
+        return await FakeWorker.__call__(env, fn, *args)
+
+    monkeypatch.setattr(app, "in_worker", area_only)
+    assert post_estimate(client, in_height=10).status_code == 200
+    (entry,) = app.VISION_CACHE_DIR.iterdir()
+    cached_area = entry / "metrics" / "metrics_area.json"
+    assert jsonio.read_json(cached_area) == AREA
+
+    # same plan, other height: vision-cache hit, walls missing -> placeholder metrics for this run
+    resp = post_estimate(client, in_height=12)
+    assert resp.status_code == 200
+    run_area = app.run_path(run_id_of(resp)) / "metrics" / "metrics_area.json"
+    assert jsonio.read_json(run_area)["rooms"][0]["name"] == "SyntheticArea"
+    assert jsonio.read_json(cached_area) == AREA
+    assert not os.path.samefile(run_area, cached_area)
+
+
+@pytest.mark.parametrize("prices_json, message", [
+    ("{not json", "not valid JSON"),
+    ("[" * 5000 + "]" * 5000, ""),  # decode error or shape error, depending on the backend
+    ('{"IN": {"brick": {"deep": 1}}}', "nested deeper"),
+    ('{"IN": [1, 2]}', "arrays"),
+    ('[{"brick": 8}]', "JSON object"),
+], ids=["syntax", "deep-nesting", "nested-section", "array-value", "not-object"])
+def test_bad_prices_json_is_400(client, env, prices_json, message):
+    resp = post_estimate(client, prices_json=prices_json)
+    assert resp.status_code == 400
+    assert message in resp.json()["error"]
+    assert env.calls == []
+    assert run_status_files() == []
+
+
+def test_oversized_prices_json_is_413(client, env):
+    resp = post_estimate(client, prices_json=" " * (app.PRICES_JSON_MAX + 1))
+    assert resp.status_code == 413
+    assert env.calls == []
+
+
+def test_prices_override_reaches_the_pipeline(client, env, monkeypatch):
+    seen = {}
+    real_estimation = app.worker.run_estimation
+
+    async def spy(fn, *args):
+        if fn is real_estimation:
+            seen["prices"] = jsonio.read_json(args[0].prices)
+        return await FakeWorker.__call__(env, fn, *args)
+
+    monkeypatch.setattr(app, "in_worker", spy)
+    resp = post_estimate(client, prices_json='{"IN": {"brick": 9.5}}')
+    assert resp.status_code == 200
+    assert seen["prices"] == {"IN": {"brick": 9.5}}
+
+
+def poll_status(client, status_url, timeout=10.0):
+    """GET status_url until the run reaches a terminal state (the queued task runs on the client's loop)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(status_url).json()
+        if status["state"] in ("done", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"run still {status['state']!r} after {timeout}s")
+
+
+def test_background_run_is_queued_then_done(client, env):
+    resp = post_estimate(client, background="true")
+    assert resp.status_code == 202
+    body = resp.json()
+    assert body["status"] == "queued"
+    assert body["status_url"] == f"/runs/{body['run_id']}/status.json"
+
+    status = poll_status(client, body["status_url"])
+    assert status["state"] == "done"
+    assert status["artifacts"] == ["final_estimate.xlsx", "final_breakdown.json"]
+    assert jsonio.read_json(app.LATEST_STATUS) == status
+
+
+def test_crashed_background_run_ends_failed(client, env):
+    env.estimation_error = RuntimeError("worker blew up")
+    body = post_estimate(client, background="true").json()
+
+    status = poll_status(client, body["status_url"])
+    assert status == {"run_id": body["run_id"], "state": "failed",
+                      "error": "RuntimeError('worker blew up')"}
+    assert jsonio.read_json(app.LATEST_STATUS) == status
+    assert not app._BACKGROUND_RUNS
+
+
+def test_failed_foreground_run_is_500_with_failed_status(client, env, monkeypatch):
+    real_estimation = app.worker.run_estimation
+
+    async def exit_code_2(fn, *args):
+        if fn is real_estimation:
+            return 2
+        return await FakeWorker.__call__(env, fn, *args)
+
+    monkeypatch.setattr(app, "in_worker", exit_code_2)
+    resp = post_estimate(client)
+    assert resp.status_code == 500
+    (status_json,) = run_status_files()
+    assert jsonio.read_json(status_json)["state"] == "failed"
+    assert jsonio.read_json(app.LATEST_STATUS)["state"] == "failed"
+    assert not any(app.CACHE_DIR.iterdir())  # failed runs are never cached
+
+
+def test_run_ids_are_sharded_by_time_bucket(client, env):
+    run_id = run_id_of(post_estimate(client))
+    assert len(run_id) == 15
+    run_dir = app.RUNS_DIR / run_id[:4] / run_id
+    assert app.run_path(run_id) == run_dir
+    assert (run_dir / "status.json").is_file()
+    assert client.get(f"/runs/{run_id}/status.json").json()["run_id"] == run_id
+
+
+def test_new_run_ids_sort_by_creation_time():
+    ids = [app.new_run_id() for _ in range(3)]
+    time.sleep(0.002)
+    later = app.new_run_id()
+    assert all(len(i) == 15 and int(i, 16) >= 0 for i in ids)
+    assert max(i[:11] for i in ids) < later[:11]
+
+
+def test_legacy_8_char_run_ids_live_flat(env):
+    assert app.run_path("0123abcd") == app.RUNS_DIR / "0123abcd"
+
+
+@pytest.mark.parametrize("run_id", ["..", "_cache", "0123ABCD", "0123abc", "0123abcd0123abcd", "0123abcd/..", ""])
+def test_run_path_rejects_anything_but_hex_ids(env, run_id):
+    assert app.run_path(run_id) is None
+
+
+@pytest.mark.parametrize("parts", [("out", ".."), ("out", "."), ("metrics", ""), ("..", "status.json")])
+def test_run_file_rejects_dot_segments(env, parts):
+    assert app.run_file("0000000000a0001", *parts) is None
+
+
+@pytest.mark.parametrize("url", [
+    "/runs/%2e%2e/status.json",              # run_id ".." -> would resolve to RUNS_DIR's parent
+    "/runs/_cache/status.json",
+    "/download/0000000000a0001/%2e%2e",      # filename ".." -> the run dir itself
+    "/runs/0000000000a0001/metrics/%2e%2e",
+    "/download/0000000000a0001/final_estimate.xlsx",  # well-formed but missing
+])
+def test_bad_or_missing_run_paths_are_404(client, env, url):
+    (app.RUNS_DIR / "status.json").write_text("{}")  # would leak if ".." were accepted
+    resp = client.get(url)
+    assert resp.status_code == 404
+
+
+def test_artifacts_revalidate_with_etag(client, env):
+    run_id = run_id_of(post_estimate(client))
+    url = f"/download/{run_id}/final_estimate.xlsx"
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.content.startswith(b"PK fake workbook")
+    assert resp.headers["cache-control"] == app.ARTIFACT_CACHE
+    etag = resp.headers["etag"]
+
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    metrics = client.get(f"/runs/{run_id}/metrics/metrics_area.json")
+    assert metrics.json() == AREA
+    assert client.get(f"/runs/{run_id}/metrics/metrics_area.json",
+                      headers={"If-None-Match": metrics.headers["etag"]}).status_code == 304
+
+
+def test_status_json_is_always_revalidated(client, env):
+    run_id = run_id_of(post_estimate(client))
+    resp = client.get(f"/runs/{run_id}/status.json")
+    assert resp.headers["cache-control"] == "no-cache"
+    assert resp.headers["content-type"] == "application/json"
+    etag = resp.headers["etag"]
+    assert client.get(f"/runs/{run_id}/status.json", headers={"If-None-Match": etag}).status_code == 304
+
+    status_json = app.run_path(run_id) / "status.json"
+    status_json.write_bytes(jsonio.dumps(dict(resp.json(), state="failed")))
+    st = status_json.stat()  # coarse fs timestamps: make the rewrite visible in the mtime-based ETag
+    os.utime(status_json, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    changed = client.get(f"/runs/{run_id}/status.json", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["state"] == "failed"
+
+
+def test_vision_cache_hit_skips_vision(client, env):
+    first = run_id_of(post_estimate(client, in_height=10))
+    assert env.calls == ["run_vision", "run_estimation"]
+
+    # same plan + manual scale, other height: vision metrics come from runs/_vision_cache
+    env.calls.clear()
+    second = run_id_of(post_estimate(client, in_height=12))
+    assert env.calls == ["run_estimation"]
+    status = jsonio.read_json(app.run_path(second) / "status.json")
+    assert status["ocr_geometry_used"] is True
+    assert status["totals"] == AREA["totals"]
+    assert status["scale_ft_per_px"] == AREA["scale_ft_per_px"]
+    assert os.path.samefile(app.run_path(first) / "metrics" / "metrics_area.json",
+                            app.run_path(second) / "metrics" / "metrics_area.json")
+
+
+def test_vision_cache_is_keyed_on_plan_and_manual_scale(client, env):
+    post_estimate(client, in_height=10)
+    env.calls.clear()
+    post_estimate(client, plan=PLAN + b"other", in_height=10)
+    post_estimate(client, in_height=10, known_width_ft=40)
+    assert env.calls.count("run_vision") == 2
+
+
+def test_failed_vision_is_not_cached(client, env):
+    env.vision_ok = False
+    resp = post_estimate(client, in_height=10)
+    assert resp.status_code == 200
+    assert "Default scale used" in resp.text
+    assert not any(app.VISION_CACHE_DIR.iterdir())
+
+
+def test_identical_run_is_served_from_the_result_cache(client, env):
+    first = run_id_of(post_estimate(client, in_height=10))
+    env.calls.clear()
+    resp = post_estimate(client, in_height=10)
+    assert resp.status_code == 200
+    second = run_id_of(resp)
+    assert env.calls == []
+    status = jsonio.read_json(app.run_path(second) / "status.json")
+    assert status["cached"] is True and status["run_id"] == second
+    assert status["metrics_area"] == f"runs/{second[:4]}/{second}/metrics/metrics_area.json"
+    assert jsonio.read_json(app.LATEST_STATUS) == status
+    assert client.get(f"/download/{second}/final_estimate.xlsx").content == \
+        (app.run_path(first) / "out" / "final_estimate.xlsx").read_bytes()
+
+
+def test_result_cache_entry_evicted_mid_restore_falls_back_to_a_run(client, env, monkeypatch):
+    post_estimate(client, in_height=10)
+
+    def flaky_restore(entry, run_dir, subdirs=app.result_cache.SUBDIRS):
+        (run_dir / "metrics" / "metrics_area.json").write_bytes(b"{}")  # linked before the entry vanished
+        raise FileNotFoundError(entry / "status.json")
+
+    monkeypatch.setattr(app.result_cache, "restore", flaky_restore)  # whole-run and vision caches alike
+    env.calls.clear()
+    resp = post_estimate(client, in_height=10)
+    assert resp.status_code == 200
+    assert env.calls == ["run_vision", "run_estimation"]
+    run_dir = app.run_path(run_id_of(resp))
+    assert (run_dir / "out" / "final_estimate.xlsx").read_bytes().startswith(b"PK fake workbook")
+    assert jsonio.read_json(run_dir / "status.json")["state"] == "done"
+    assert jsonio.read_json(run_dir / "metrics" / "metrics_area.json") == AREA
+
+
+def test_result_cache_disabled(client, env, monkeypatch):
+    monkeypatch.setattr(app, "CACHE_MAX_BYTES", 0)
+    post_estimate(client, in_height=10)
+    post_estimate(client, in_height=10)
+    assert env.calls == ["run_vision", "run_estimation"] * 2
+    assert not any(app.CACHE_DIR.iterdir()) and not any(app.VISION_CACHE_DIR.iterdir())
+
+
+def test_each_run_estimates_in_its_own_work_dir(client, env):
+    ids = [run_id_of(post_estimate(client, in_height=h)) for h in (10, 11)]
+    assert env.work_dirs == [app.run_path(i) / "work" for i in ids]
+
+
+def test_run_estimation_runs_in_a_private_data_dir(tmp_path, monkeypatch):
+    import main as estimator_main
+    seen = {}
+
+    def fake_pipeline(args):
+        seen["cwd"] = os.getcwd()
+        seen["prices"] = jsonio.read_json("data/prices.json")
+        jsonio.write_json("data/output/qty_usa.json", {"run": args})
+
+    monkeypatch.setattr(estimator_main, "run_pipeline", fake_pipeline)
+    shared = app.worker.APP_ROOT / "data" / "output" / "qty_usa.json"
+    before = shared.read_bytes()
+    cwd = os.getcwd()
+
+    work = tmp_path / "work"
+    assert app.worker.run_estimation("A", work) == 0
+    assert seen["cwd"] == str(work)
+    assert seen["prices"] == jsonio.read_json(app.worker.APP_ROOT / "data" / "prices.json")
+    assert jsonio.read_json(work / "data" / "output" / "qty_usa.json") == {"run": "A"}
+    for rel in app.worker.RUN_INPUTS:  # copies of whichever shared inputs this checkout has
+        assert (work / "data" / rel).exists() == (app.worker.APP_ROOT / "data" / rel).exists()
+    assert shared.read_bytes() == before
+    assert os.getcwd() == cwd
+
+
+def test_run_estimation_maps_system_exit_and_restores_cwd(tmp_path, monkeypatch):
+    import main as estimator_main
+
+    def failing_stage(args):
+        raise SystemExit(3)
+
+    monkeypatch.setattr(estimator_main, "run_pipeline", failing_stage)
+    cwd = os.getcwd()
+    assert app.worker.run_estimation(None, tmp_path / "work") == 3
+    assert os.getcwd() == cwd
+
+
+def test_run_estimation_real_pipeline_leaves_shared_output_alone(tmp_path):
+    import main as estimator_main
+    shared = app.worker.APP_ROOT / "data" / "output"
+    before = {p.name: p.stat().st_mtime_ns for p in shared.iterdir() if p.is_file()}
+    out = tmp_path / "out"
+    data = app.worker.APP_ROOT / "data"
+    args = estimator_main.build_parser().parse_args([
+        "--mode", "both", "--prices", str(data / "prices.json"), "--outdir", str(out),
+        "--metrics_area", str(data / "samples" / "metrics_area.json"),
+        "--metrics_walls", str(data / "samples" / "metrics_walls.json")])
+    assert app.worker.run_estimation(args, tmp_path / "work") == 0
+    assert {"final_estimate.xlsx", "final_estimate.pdf", "final_breakdown.json"} <= {p.name for p in out.iterdir()}
+    assert {p.name: p.stat().st_mtime_ns for p in shared.iterdir() if p.is_file()} == before
@@ -0,0 +1,45 @@
+# tests/test_compare_dashboard.py
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+
+import compare_dashboard
+
+TOTALS = [
+    (1.2e5, 8.0e4, 2.0e5, 9.0e3, 6.0e3, 1.5e4),
+    (4.8e6, 2.9e6, 7.7e6, 6.1e4, 3.3e4, 9.4e4),  # INR totals in the millions: offset text on the y axis
+]
+
+
+def reference_preview(totals, png):
+    """The preview as first written: a new figure per run, laid out with tight_layout."""
+    fig = Figure(figsize=(8, 4.5))
+    ax = fig.add_subplot(111)
+    x, width = range(2), 0.35
+    ax.bar([i - width/2 for i in x], [totals[0], totals[1]], width, label="India")
+    ax.bar([i + width/2 for i in x], [totals[3], totals[4]], width, label="USA")
+    ax.set_xticks(list(x), ["Materials", "Labor"])
+    ax.set_ylabel("Amount")
+    ax.set_title("India vs USA – Materials & Labor")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(png, dpi=150)
+
+
+@pytest.mark.parametrize("totals", TOTALS)
+def test_reused_figure_renders_like_a_fresh_tight_layout(tmp_path, totals):
+    compare_dashboard.save_preview(TOTALS[1 - TOTALS.index(totals)], tmp_path / "previous.png")
+    compare_dashboard.save_preview(totals, tmp_path / "preview.png")
+    reference_preview(totals, tmp_path / "reference.png")
+    assert np.array_equal(imread(tmp_path / "preview.png"), imread(tmp_path / "reference.png"))
+
+
+@pytest.mark.parametrize("totals", TOTALS)
+def test_preview_keeps_axes_labels_inside_the_figure(tmp_path, totals):
+    compare_dashboard.save_preview(totals, tmp_path / "preview.png")
+    fig = compare_dashboard._FIG
+    (ax,) = fig.axes
+    box = ax.get_tightbbox()  # ticks, labels and title, in display pixels
+    assert box.x0 >= fig.bbox.x0 and box.y0 >= fig.bbox.y0
+    assert box.x1 <= fig.bbox.x1 and box.y1 <= fig.bbox.y1
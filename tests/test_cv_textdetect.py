@@ -0,0 +1,40 @@
+# tests/test_cv_textdetect.py
+import cv2
+import numpy as np
+import pytest
+
+import cv_textdetect
+
+
+def reference(img_bgr):
+    """The original threshold-then-invert preprocessing (np.mean of the binarized image)."""
+    gray = cv2.GaussianBlur(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.mean(th) < 127:
+        th = cv2.bitwise_not(th)
+    return cv2.dilate(th, cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2)), 1)
+
+
+def page(paper, ink, ink_frac=0.1):
+    """Grey-level plan: paper background with a block of ink covering ink_frac of the rows."""
+    img = np.full((200, 300), paper, np.uint8)
+    img[20:20 + int(200 * ink_frac), 20:280] = ink
+    cv2.putText(img, "12'-6\"", (40, 150), cv2.FONT_HERSHEY_SIMPLEX, 1.5, ink, 3)
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+
+@pytest.mark.parametrize("paper, ink, ink_frac", [
+    (245, 10, 0.1),   # white paper, black ink
+    (10, 245, 0.1),   # inverted scan: black background
+    (100, 20, 0.1),   # dark-toned paper: gray mean < 127 but Otsu leaves it mostly white
+    (200, 30, 0.7),   # ink-heavy page: mostly black after Otsu
+])
+def test_matches_threshold_then_invert(paper, ink, ink_frac):
+    img = page(paper, ink, ink_frac)
+    assert np.array_equal(cv_textdetect.preprocess_for_ocr(img), reference(img))
+
+
+def test_dark_paper_keeps_black_text_on_white():
+    out = cv_textdetect.preprocess_for_ocr(page(100, 20))
+    assert out[5, 5] == 255       # paper corner stays white
+    assert out[30, 150] == 0      # ink block stays black
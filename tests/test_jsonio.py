@@ -0,0 +1,81 @@
+# tests/test_jsonio.py
+import json
+import os
+
+import pytest
+
+import jsonio
+
+SAMPLE = {"name": "Wand", "dims": [10.5, 12, None], "ok": True, "nested": {"ft²": "12'-6\""}}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        if jsonio.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(jsonio, "orjson", None)
+    monkeypatch.setattr(jsonio, "_CACHE", {})
+    return request.param
+
+
+def test_dumps_indented_matches_stdlib_layout(backend):
+    out = jsonio.dumps(SAMPLE)
+    assert isinstance(out, bytes)
+    assert out.decode("utf-8") == json.dumps(SAMPLE, indent=2, ensure_ascii=False)
+
+
+def test_dumps_compact_with_indent_false(backend):
+    out = jsonio.dumps(SAMPLE, indent=False)
+    assert b"\n" not in out
+    assert out.decode("utf-8") == json.dumps(SAMPLE, separators=(",", ":"), ensure_ascii=False)
+
+
+def test_non_ascii_is_written_as_utf8(backend):
+    out = jsonio.dumps({"unit": "ft²"}, indent=False)
+    assert "ft²".encode("utf-8") in out
+    assert b"\\u" not in out
+
+
+def test_loads_accepts_bytes_and_str(backend):
+    raw = json.dumps(SAMPLE)
+    assert jsonio.loads(raw) == SAMPLE
+    assert jsonio.loads(raw.encode("utf-8")) == SAMPLE
+
+
+def test_write_read_round_trip(backend, tmp_path):
+    for indent in (True, False):
+        path = tmp_path / f"out_{indent}.json"
+        jsonio.write_json(path, SAMPLE, indent=indent)
+        assert jsonio.read_json(path) == SAMPLE
+        assert json.loads(path.read_text(encoding="utf-8")) == SAMPLE
+
+
+def test_read_json_cached_reparses_only_on_change(backend, tmp_path):
+    path = tmp_path / "prices.json"
+    jsonio.write_json(path, {"IN": {"brick": 8}})
+    first = jsonio.read_json_cached(path)
+    assert jsonio.read_json_cached(str(path)) is first
+
+    jsonio.write_json(path, {"IN": {"brick": 9, "cement": 400}})
+    second = jsonio.read_json_cached(path)
+    assert second == {"IN": {"brick": 9, "cement": 400}}
+    assert second is not first
+
+
+def test_read_json_cached_same_size_rewrite(backend, tmp_path):
+    path = tmp_path / "prices.json"
+    jsonio.write_json(path, {"v": 1})
+    assert jsonio.read_json_cached(path) == {"v": 1}
+    st = os.stat(path)
+    jsonio.write_json(path, {"v": 2})
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert jsonio.read_json_cached(path) == {"v": 2}
+
+
+def test_orjson_serializes_numpy():
+    np = pytest.importorskip("numpy")
+    if jsonio.orjson is None:
+        pytest.skip("orjson not installed")
+    assert jsonio.loads(jsonio.dumps({"xs": np.array([1.5, 2.0])})) == {"xs": [1.5, 2.0]}
@@ -0,0 +1,147 @@
+# tests/test_result_cache.py
+import os
+import shutil
+
+import pytest
+
+import jsonio
+import result_cache
+
+
+def make_run(run_dir, payload=b"x" * 100):
+    """A finished run dir shaped like app.py's: out/ + metrics/."""
+    (run_dir / "out").mkdir(parents=True)
+    (run_dir / "metrics").mkdir()
+    (run_dir / "out" / "final_estimate.xlsx").write_bytes(payload)
+    jsonio.write_json(run_dir / "metrics" / "metrics_area.json", {"totals": {"total_area_ft2": 100.0}})
+    return run_dir
+
+
+def test_key_is_stable_across_dict_ordering(tmp_path):
+    a = result_cache.compute_key("ab" * 32, {"mode": "both", "in_height": 10.0}, ())
+    b = result_cache.compute_key("ab" * 32, {"in_height": 10.0, "mode": "both"}, ())
+    assert a == b
+    assert len(a) == 16
+
+
+def test_key_covers_params_plan_and_input_files(tmp_path):
+    prices = tmp_path / "prices.json"
+    prices.write_bytes(b'{"IN": {}}')
+    base = result_cache.compute_key("ab" * 32, {"mode": "both"}, [prices])
+    assert result_cache.compute_key("ab" * 32, {"mode": "usa"}, [prices]) != base
+    assert result_cache.compute_key("cd" * 32, {"mode": "both"}, [prices]) != base
+    prices.write_bytes(b'{"IN": {"brick": 1}}')
+    assert result_cache.compute_key("ab" * 32, {"mode": "both"}, [prices]) != base
+    # a missing input file still yields a (different) key instead of raising
+    missing = result_cache.compute_key("ab" * 32, {"mode": "both"}, [tmp_path / "nope.json"])
+    assert missing != base
+
+
+def test_store_lookup_restore_round_trip(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    src = make_run(tmp_path / "run1")
+    status = {"state": "done", "artifacts": ["final_estimate.xlsx"]}
+
+    assert result_cache.lookup(cache_dir, "k1") is None
+    result_cache.store(cache_dir, "k1", src, status, max_bytes=1 << 20)
+    entry = result_cache.lookup(cache_dir, "k1")
+    assert entry == cache_dir / "k1"
+    assert not [p for p in os.listdir(cache_dir) if p.endswith(".tmp")]
+
+    dst = tmp_path / "run2"
+    dst.mkdir()
+    assert result_cache.restore(entry, dst) == status
+    for rel in ("out/final_estimate.xlsx", "metrics/metrics_area.json"):
+        assert (dst / rel).read_bytes() == (src / rel).read_bytes()
+        assert os.path.samefile(dst / rel, src / rel)  # hardlinked, not copied
+
+
+def test_restore_only_requested_subdirs(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run1"), {"ocr_ok": True}, 1 << 20,
+                       subdirs=("metrics",))
+    dst = tmp_path / "run2"
+    dst.mkdir()
+    result_cache.restore(cache_dir / "k1", dst, ("metrics",))
+    assert (dst / "metrics" / "metrics_area.json").exists()
+    assert not (dst / "out").exists()
+
+
+def test_second_store_of_same_key_keeps_first_entry(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run1", b"first"), {"n": 1}, 1 << 20)
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run2", b"second"), {"n": 2}, 1 << 20)
+    assert jsonio.read_json(cache_dir / "k1" / "status.json") == {"n": 1}
+    assert (cache_dir / "k1" / "out" / "final_estimate.xlsx").read_bytes() == b"first"
+    assert not [p for p in os.listdir(cache_dir) if p.startswith(".")]
+
+
+def test_evict_drops_least_recently_used_until_under_cap(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    for i, key in enumerate(("old", "mid", "new")):
+        result_cache.store(cache_dir, key, make_run(tmp_path / f"run{i}"), {}, max_bytes=1 << 20)
+        os.utime(cache_dir / key, (1000 + i, 1000 + i))
+    entry_size = result_cache._tree_size(str(cache_dir / "old"))
+
+    # a hit refreshes the entry: "old" becomes the most recently used
+    assert result_cache.lookup(cache_dir, "old") is not None
+    result_cache.evict(cache_dir, max_bytes=2 * entry_size)
+    assert sorted(os.listdir(cache_dir)) == ["new", "old"]
+
+    result_cache.evict(cache_dir, max_bytes=entry_size)
+    assert os.listdir(cache_dir) == ["old"]
+
+
+def test_store_evicts_over_the_byte_cap(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "a", make_run(tmp_path / "run1"), {}, max_bytes=1 << 20)
+    os.utime(cache_dir / "a", (1000, 1000))
+    entry_size = result_cache._tree_size(str(cache_dir / "a"))
+    result_cache.store(cache_dir, "b", make_run(tmp_path / "run2"), {}, max_bytes=entry_size)
+    assert os.listdir(cache_dir) == ["b"]
+
+
+def test_restore_of_entry_evicted_after_lookup_raises(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run1"), {}, 1 << 20)
+    entry = result_cache.lookup(cache_dir, "k1")
+    shutil.rmtree(entry)  # evicted by a concurrent store between lookup and restore
+
+    dst = tmp_path / "run2"
+    dst.mkdir()
+    with pytest.raises(OSError):
+        result_cache.restore(entry, dst)
+    assert result_cache.lookup(cache_dir, "k1") is None
+
+
+def test_restore_of_entry_evicted_mid_restore_raises(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run1"), {}, 1 << 20)
+    entry = result_cache.lookup(cache_dir, "k1")
+    (entry / "status.json").unlink()  # rmtree got past status.json but not the subdirs yet
+
+    dst = tmp_path / "run2"
+    dst.mkdir()
+    with pytest.raises((OSError, ValueError)):
+        result_cache.restore(entry, dst)
+
+
+def test_replace_file_leaves_hardlinked_entry_intact(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    result_cache.store(cache_dir, "k1", make_run(tmp_path / "run1", b"cached"), {}, 1 << 20)
+    dst = tmp_path / "run2"
+    dst.mkdir()
+    result_cache.restore(cache_dir / "k1", dst)
+
+    result_cache.replace_file(dst / "out" / "final_estimate.xlsx", b"rewritten")
+    assert (dst / "out" / "final_estimate.xlsx").read_bytes() == b"rewritten"
+    assert (cache_dir / "k1" / "out" / "final_estimate.xlsx").read_bytes() == b"cached"
+    assert not [p for p in os.listdir(dst / "out") if p.endswith(".tmp")]
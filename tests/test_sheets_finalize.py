@@ -0,0 +1,88 @@
+# tests/test_sheets_finalize.py
+import shutil
+
+import pytest
+from openpyxl import load_workbook
+
+from conftest import APP_ROOT
+
+import boq_excel
+import compare_dashboard
+import excel_charts
+import rates_export
+import sheets_finalize
+
+INPUTS = ("qty_india_total.json", "qty_usa.json", "doors_windows.json", "flooring.json", "area_summary.json")
+
+
+def fresh_workspace(root):
+    """data/ tree holding the committed sample quantities + a rates_export workbook."""
+    out = root / "data" / "output"
+    out.mkdir(parents=True)
+    shutil.copy(APP_ROOT / "data" / "prices.json", root / "data" / "prices.json")
+    for name in INPUTS:
+        shutil.copy(APP_ROOT / "data" / "output" / name, out / name)
+    rates_export.main(["--prices", str(root / "data" / "prices.json"),
+                       "--in_json", str(out / "qty_india_total.json"),
+                       "--us_json", str(out / "qty_usa.json"),
+                       "--out_xlsx", str(out / "final_estimate.xlsx"),
+                       "--out_pdf", str(out / "final_estimate.pdf"),
+                       "--out_json", str(out / "final_breakdown.json")])
+    return out
+
+
+def snapshot(xlsx):
+    wb = load_workbook(xlsx)
+    return {
+        ws.title: ([[c.value for c in row] for row in ws.iter_rows()], len(ws._charts), len(ws._images))
+        for ws in wb.worksheets
+    }
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return fresh_workspace(tmp_path)
+
+
+def test_adds_every_sheet_and_preview(workspace):
+    sheets_finalize.main(["--compare"])
+    names = load_workbook(workspace / "final_estimate.xlsx").sheetnames
+    for sheet in ("Summary", "Doors_Windows", "Flooring", "Area_Summary", "Charts", "Compare", "BOQ"):
+        assert sheet in names
+    assert (workspace / "compare_preview.png").stat().st_size > 0
+
+
+def test_without_compare_skips_compare_sheet(workspace):
+    sheets_finalize.main([])
+    names = load_workbook(workspace / "final_estimate.xlsx").sheetnames
+    assert "Compare" not in names
+    assert "BOQ" in names and "Charts" in names
+    assert not (workspace / "compare_preview.png").exists()
+
+
+def test_matches_the_three_scripts_run_back_to_back(workspace, tmp_path, monkeypatch):
+    sheets_finalize.main(["--compare"])
+    single_pass = snapshot(workspace / "final_estimate.xlsx")
+
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    monkeypatch.chdir(legacy)
+    out = fresh_workspace(legacy)
+    excel_charts.main()
+    compare_dashboard.main()
+    boq_excel.main()
+    assert snapshot(out / "final_estimate.xlsx") == single_pass
+
+
+def test_rerun_does_not_duplicate_sheets(workspace):
+    sheets_finalize.main(["--compare"])
+    first = load_workbook(workspace / "final_estimate.xlsx").sheetnames
+    sheets_finalize.main(["--compare"])
+    assert load_workbook(workspace / "final_estimate.xlsx").sheetnames == first
+
+
+def test_missing_workbook_exits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit):
+        sheets_finalize.main([])
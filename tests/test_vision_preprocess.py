@@ -0,0 +1,41 @@
+# tests/test_vision_preprocess.py
+import subprocess
+
+import pytest
+
+from vision import preprocess
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(preprocess.shutil, "which", lambda name: "/usr/bin/" + name)
+    path = tmp_path / "plan.pdf"
+    path.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    return path
+
+
+def test_render_timeout_becomes_system_exit(pdf, monkeypatch):
+    seen = {}
+
+    def hang(cmd, **kwargs):
+        seen.update(kwargs)
+        raise subprocess.TimeoutExpired(cmd, kwargs["timeout"])
+
+    monkeypatch.setattr(preprocess.subprocess, "run", hang)
+    with pytest.raises(SystemExit, match="timed out"):
+        preprocess.load_image(pdf)
+    assert seen["timeout"] == preprocess.PDF_RENDER_TIMEOUT
+
+
+def test_oversized_pdf_is_rejected_before_rendering(pdf, monkeypatch):
+    monkeypatch.setattr(preprocess, "PDF_MAX_BYTES", 8)
+    monkeypatch.setattr(preprocess.subprocess, "run", lambda *a, **k: pytest.fail("rendered an oversized PDF"))
+    with pytest.raises(SystemExit, match="larger than"):
+        preprocess.load_image(pdf)
+
+
+def test_failed_render_is_system_exit(pdf, monkeypatch):
+    monkeypatch.setattr(preprocess.subprocess, "run",
+                        lambda cmd, **k: subprocess.CompletedProcess(cmd, 1, b"", b"Syntax Error"))
+    with pytest.raises(SystemExit, match="Could not render"):
+        preprocess.load_image(pdf)
@@ -0,0 +1,107 @@
+# worker.py — warm process pool for the heavy /estimate work
+"""
+Runs the vision + estimation pipelines in long-lived worker processes.
+
+Each worker imports cv2 / pytesseract / openpyxl / reportlab and the pipeline
+modules once (pool initializer), so a request only pays for the work itself,
+not for interpreter start-up and imports. A sys.exit() inside a stage is
+turned into an exit code, and a worker that dies outright (segfault, OOM
+kill) only breaks the pool: app.in_worker then fails that run and replaces
+the pool, so the API process and later requests are unaffected.
+"""
+import os, sys, shutil, importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+APP_ROOT = Path(__file__).parent.resolve()
+SRC_DIR = str(APP_ROOT / "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# Shared inputs the stages read by cwd-relative path (under data/); copied into each
+# run's work dir so every run has a private data/output next to them
+RUN_INPUTS = ("prices.json", "logo.png", "inputs",
+              os.path.join("samples", "metrics_walls.json"), os.path.join("samples", "metrics_area.json"))
+
+
+def _preimport(n_workers: int = 1):
+    if n_workers > 1:
+        # workers already OCR in parallel; N tesseract runs each starting an OpenMP
+        # team per core would oversubscribe the CPU (explicit env setting wins)
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    import cv2, openpyxl, pytesseract, reportlab  # noqa: F401
+    import main  # noqa: F401
+    for stage in main.STAGES:
+        importlib.import_module(stage)
+    from vision import pipeline  # noqa: F401
+
+
+def prepare_workdir(work_dir: Path) -> None:
+    """work_dir/data with copies of RUN_INPUTS and an empty output/ (the stages' data/output)."""
+    src_data = APP_ROOT / "data"
+    dst_data = Path(work_dir) / "data"
+    (dst_data / "output").mkdir(parents=True, exist_ok=True)
+    for rel in RUN_INPUTS:
+        src = src_data / rel
+        dst = dst_data / rel
+        if src.is_dir():
+            shutil.copytree(src, dst, dirs_exist_ok=True)
+        elif src.is_file():
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
+
+
+def run_estimation(args, work_dir=None) -> int:
+    """
+    In-process equivalent of `python src/main.py ...`; returns an exit code.
+    With work_dir, the stages run with it as cwd (see prepare_workdir), so concurrent
+    runs in other pool workers never share data/output. A pool worker runs one task
+    at a time, so changing this process's cwd is safe.
+    """
+    import main as estimator_main
+    prev_cwd = os.getcwd()
+    if work_dir is not None:
+        prepare_workdir(work_dir)
+        os.chdir(work_dir)
+    try:
+        estimator_main.run_pipeline(args)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    finally:
+        os.chdir(prev_cwd)
+    return 0
+
+
+def run_vision(*args, **kwargs) -> bool:
+    from vision import pipeline
+    return pipeline.run_vision(*args, **kwargs)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def warm_up(pool: ProcessPoolExecutor, n: int) -> None:
+    """
+    Start all n workers now (the executor spawns them lazily, one per submit
+    that finds no idle worker), so their imports overlap app start-up instead
+    of landing on the first /estimate requests. Does not wait.
+    """
+    for _ in range(n):
+        pool.submit(_ping)
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def create_pool(max_workers: int = 0) -> ProcessPoolExecutor:
+    # spawn: never fork a threaded server process (and matches Windows behaviour)
+    n = max_workers or default_workers()
+    return ProcessPoolExecutor(
+        max_workers=n,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_preimport,
+        initargs=(n,),
+    )